@@ -1,37 +1,118 @@
-from langgraph.graph import StateGraph, END
+from functools import lru_cache
+from langgraph.graph import StateGraph, START, END
 from langgraph.pregel import Pregel
 from typing import TypedDict, Optional
+from instrumentation import collect_spans, span, spans_table, traced
 from load_contracts import get_procurement_summary
+from result_cache import cached_result, lookup
 from scenario_planning import get_scenario_summary
 from sku_rationalization import get_sku_summary
 # import pprint
 
 # === Define Shared State ===
 class AgentState(TypedDict):
+    demand_change: Optional[float]
     scenario_summary: Optional[str]
     sku_summary: Optional[str]
     procurement_summary: Optional[str]
-    # final_dashboard: Optional[str]  
+    final_dashboard: Optional[str]
+DEFAULT_DEMAND_CHANGE = -15
+SUMMARY_HEADERS = {
+    "procurement_summary": "📑 Procurement Summary:\n",
+    "scenario_summary": "📈 Scenario Planning Summary:\n",
+    "sku_summary": "📦 SKU Rationalization Summary:\n",
+}
+def scenario_params(demand_change):
+    # Result cache parameters for a scenario summary (-15 and -15.0 are the same run)
+    return {"demand_change": float(DEFAULT_DEMAND_CHANGE if demand_change is None else demand_change)}
+# Analysis nodes run in parallel, so each returns only the key it owns;
+# returning the full state would make concurrent writes to the same keys collide.
+# Summaries come from the shared result cache when any session already built them.
 # === Node 1: Procurement Analysis ===
 def procurement_node(state: AgentState) -> AgentState:
-    summary = get_procurement_summary()
-    return {**state, "procurement_summary": "📑 Procurement Summary:\n" + summary}   
+    summary = cached_result("procurement_summary", get_procurement_summary)
+    return {"procurement_summary": SUMMARY_HEADERS["procurement_summary"] + summary}
 # === Node 2: Scenario Planning Analysis ===
 def scenario_node(state: AgentState) -> AgentState:
-    summary = get_scenario_summary(-15)  # You can change this to any % dynamically later
-    return {**state, "scenario_summary": "📈 Scenario Planning Summary:\n" + summary}  
+    demand_change = state.get("demand_change")
+    demand_change = DEFAULT_DEMAND_CHANGE if demand_change is None else demand_change
+    summary = cached_result("scenario_summary", lambda: get_scenario_summary(demand_change), scenario_params(demand_change))
+    return {"scenario_summary": SUMMARY_HEADERS["scenario_summary"] + summary}
 # === Node 3: SKU Rationalization ===
 def sku_node(state: AgentState) -> AgentState:
-    summary = get_sku_summary()
-    return {**state, "sku_summary": "📦 SKU Rationalization Summary:\n" + summary} 
+    summary = cached_result("sku_summary", get_sku_summary)
+    return {"sku_summary": SUMMARY_HEADERS["sku_summary"] + summary}
 # === Node 4: Final Dashboard Aggregation ===
 def dashboard_node(state: AgentState) -> AgentState:
     dashboard = (
         "\n🧾 FINAL SUPPLY CHAIN DASHBOARD\n"
         "=====================================\n"
-        f"{state.get('procurement_summary', '❗ No procurement summary available.')}\n\n"
-        f"{state.get('scenario_summary', '❗ No scenario summary available.')}\n\n"
-        f"{state.get('sku_summary', '❗ No SKU summary available.')}\n"
+        f"{state.get('procurement_summary') or '❗ No procurement summary available.'}\n\n"
+        f"{state.get('scenario_summary') or '❗ No scenario summary available.'}\n\n"
+        f"{state.get('sku_summary') or '❗ No SKU summary available.'}\n"
         "=====================================\n"
     )
-    return {**state, "final_dashboard": dashboard}
+    return {"final_dashboard": dashboard}
+
+# === Graph: fan out the three analyses, join into the dashboard ===
+ANALYSIS_NODES = {
+    "procurement": procurement_node,
+    "scenario": scenario_node,
+    "sku": sku_node,
+}
+
+@lru_cache(maxsize=1)
+def build_pipeline() -> Pregel:
+    builder = StateGraph(AgentState)
+    for name, node in ANALYSIS_NODES.items():
+        builder.add_node(name, traced(f"node.{name}")(node))
+        builder.add_edge(START, name)
+    builder.add_node("dashboard", traced("node.dashboard")(dashboard_node))
+    builder.add_edge(list(ANALYSIS_NODES), "dashboard")  # waits for all three
+    builder.add_edge("dashboard", END)
+    return builder.compile()
+
+def run_pipeline(on_node_complete=None, demand_change=DEFAULT_DEMAND_CHANGE) -> AgentState:
+    # on_node_complete(node_name, state) is called as each node finishes.
+    state = AgentState(
+        demand_change=demand_change,
+        scenario_summary=None,
+        sku_summary=None,
+        procurement_summary=None,
+        final_dashboard=None,
+    )
+    # Node spans are children of pipeline.run: LangGraph runs parallel nodes in
+    # threads with a copy of the caller's context.
+    with span("pipeline.run", demand_change=demand_change):
+        for update in build_pipeline().stream(dict(state), stream_mode="updates"):
+            for node_name, values in update.items():
+                state.update(values or {})
+                if on_node_complete:
+                    on_node_complete(node_name, state)
+    return state
+
+def cached_state(demand_change=DEFAULT_DEMAND_CHANGE):
+    # The full pipeline result straight from the result cache, or None when any
+    # analysis still has to run.
+    state = AgentState(
+        demand_change=demand_change,
+        scenario_summary=None,
+        sku_summary=None,
+        procurement_summary=None,
+        final_dashboard=None,
+    )
+    for key, params in (("procurement_summary", None), ("scenario_summary", scenario_params(demand_change)),
+                        ("sku_summary", None)):
+        _, _, summary = lookup(key, params)
+        if summary is None:
+            return None
+        state[key] = SUMMARY_HEADERS[key] + summary
+    state.update(dashboard_node(state))
+    return state
+
+if __name__ == "__main__":
+    with collect_spans() as spans:
+        result = run_pipeline(lambda node_name, _: print(f"✅ {node_name} complete"))
+    print(result["final_dashboard"])
+    for row in spans_table(spans):
+        print(f"⏱️ {row['Duration (ms)']:>10.1f} ms  {row['Stage']}")
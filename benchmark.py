@@ -0,0 +1,588 @@
+# benchmark.py
+# Benchmarks for the analysis modules.
+#   python benchmark.py sku-classify --rows 1000000
+#   python benchmark.py suite --rows 1000 100000 10000000 --contracts 1 8 32 --output bench.json
+#   python benchmark.py compare old.json new.json
+#
+# The suite runs every case in a fresh child process (so peak RSS is per case)
+# against synthetic data and a local stub of Ollama's /api/generate.
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.environ.get("BENCH_DIR", "./.cache/bench")
+
+# === Synthetic data ===
+def synthetic_sku_metrics(n_rows, seed=0):
+    # Spreads values across every rule threshold, and plants exact boundary
+    # values and NaNs so equivalence checks cover the edge cases.
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Profit Margin': rng.uniform(-0.2, 0.6, n_rows),
+        'Sales Velocity': rng.uniform(0.0, 2.0, n_rows),
+        'Defect rates': rng.uniform(0.0, 5.0, n_rows),
+    })
+    edges = {
+        'Profit Margin': [0.1, 0.25, np.nan],
+        'Sales Velocity': [0.5, 1.0, np.nan],
+        'Defect rates': [1.5, 3.5, np.nan],
+    }
+    for column, values in edges.items():
+        picks = rng.integers(0, n_rows, size=max(n_rows // 100, 1))
+        df.loc[picks, column] = rng.choice(values, size=len(picks))
+    return df
+
+# Label sets and value ranges follow historical data/supply_chain_data.csv
+SUPPLY_CHAIN_LABELS = {
+    'Product type': ['haircare', 'skincare', 'cosmetics'],
+    'Customer demographics': ['Non-binary', 'Female', 'Unknown', 'Male'],
+    'Shipping carriers': ['Carrier A', 'Carrier B', 'Carrier C'],
+    'Supplier name': ['Supplier 1', 'Supplier 2', 'Supplier 3', 'Supplier 4', 'Supplier 5'],
+    'Location': ['Mumbai', 'Kolkata', 'Delhi', 'Bangalore', 'Chennai'],
+    'Inspection results': ['Pending', 'Fail', 'Pass'],
+    'Transportation modes': ['Road', 'Air', 'Rail', 'Sea'],
+    'Routes': ['Route A', 'Route B', 'Route C'],
+}
+SYNTHETIC_CHUNK_ROWS = 1_000_000
+
+def _synthetic_supply_chain_chunk(rng, start, n_rows):
+    def labels(column):
+        return rng.choice(SUPPLY_CHAIN_LABELS[column], n_rows)
+
+    return pd.DataFrame({
+        'Product type': labels('Product type'),
+        'SKU': [f"SKU{i}" for i in range(start, start + n_rows)],
+        'Price': rng.uniform(1, 100, n_rows),
+        'Availability': rng.integers(1, 101, n_rows),
+        'Number of products sold': rng.integers(8, 1000, n_rows),
+        'Revenue generated': rng.uniform(1000, 10000, n_rows),
+        'Customer demographics': labels('Customer demographics'),
+        'Stock levels': rng.integers(0, 101, n_rows),
+        'Lead times': rng.integers(1, 31, n_rows),
+        'Order quantities': rng.integers(1, 101, n_rows),
+        'Shipping times': rng.integers(1, 11, n_rows),
+        'Shipping carriers': labels('Shipping carriers'),
+        'Shipping costs': rng.uniform(1, 10, n_rows),
+        'Supplier name': labels('Supplier name'),
+        'Location': labels('Location'),
+        'Lead time': rng.integers(1, 31, n_rows),
+        'Production volumes': rng.integers(100, 1000, n_rows),
+        'Manufacturing lead time': rng.integers(1, 31, n_rows),
+        'Manufacturing costs': rng.uniform(1, 100, n_rows),
+        'Inspection results': labels('Inspection results'),
+        'Defect rates': rng.uniform(0, 5, n_rows),
+        'Transportation modes': labels('Transportation modes'),
+        'Routes': labels('Routes'),
+        'Costs': rng.uniform(100, 1000, n_rows),
+    })
+
+def write_synthetic_supply_chain(path, n_rows, seed=0):
+    # Same columns as supply_chain_data.csv, written in chunks so 10^7 rows
+    # never sit in memory at once.
+    rng = np.random.default_rng(seed)
+    tmp_path = path + ".tmp"
+    for start in range(0, n_rows, SYNTHETIC_CHUNK_ROWS):
+        chunk = _synthetic_supply_chain_chunk(rng, start, min(SYNTHETIC_CHUNK_ROWS, n_rows - start))
+        chunk.to_csv(tmp_path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+CONTRACT_CLAUSES = [
+    "Either party may terminate this Agreement upon {n} days written notice if the other party materially breaches any provision and fails to cure within the notice period.",
+    "The Supplier's aggregate liability under this Agreement shall not exceed the fees paid in the {n} months preceding the claim.",
+    "Invoices are payable within {n} days of receipt; late payments accrue interest at {m} percent per month.",
+    "The Supplier shall deliver the Goods within {n} business days and maintain an on-time delivery rate of at least {m} percent.",
+    "Each party shall indemnify the other against third party claims arising from its negligence or wilful misconduct.",
+    "Service credits of {m} percent of the monthly fee apply for each hour of unplanned downtime beyond {n} hours.",
+    "Neither party shall be liable for delays caused by events beyond its reasonable control, including strikes, floods and epidemics.",
+    "All confidential information shall be returned or destroyed within {n} days after termination of this Agreement.",
+]
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_synthetic_contract(path, n_pages=5, seed=0, lines_per_page=45):
+    # Hand-written minimal PDF (Helvetica text pages, no dependencies) with
+    # clause-like sentences so chunking and retrieval see realistic text.
+    rng = random.Random(seed)
+    pages = []
+    for page in range(n_pages):
+        lines = [f"Section {page + 1}. Terms and Conditions"]
+        while len(lines) < lines_per_page:
+            clause = rng.choice(CONTRACT_CLAUSES).format(n=rng.randint(5, 90), m=rng.randint(1, 20))
+            words = clause.split()
+            while words:  # wrap at ~95 characters
+                line = []
+                while words and len(" ".join(line + words[:1])) <= 95:
+                    line.append(words.pop(0))
+                lines.append(" ".join(line))
+        text = "\n".join(f"({_pdf_escape(line)}) Tj T*" for line in lines[:lines_per_page])
+        pages.append(f"BT /F1 10 Tf 14 TL 50 790 Td\n{text}\nET")
+
+    # Objects: 1 catalog, 2 page tree, 3 font, then a page + content stream per page
+    page_ids = [4 + 2 * i for i in range(n_pages)]
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {n_pages} >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for page_id, content in zip(page_ids, pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        )
+        stream = content.encode("latin-1")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{content}\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref_offset = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(out)
+    return path
+
+def synthetic_dataset(n_rows, seed=0, bench_dir=BENCH_DIR):
+    # Generated once per (rows, seed) and reused across runs.
+    path = os.path.join(os.path.abspath(bench_dir), "data", f"supply_chain_{n_rows}_{seed}.csv")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_synthetic_supply_chain(path, n_rows, seed)
+    return path
+
+def synthetic_corpus(n_contracts, pages=5, seed=0, bench_dir=BENCH_DIR):
+    # Returns a working directory whose ./contracts holds n_contracts PDFs,
+    # matching the CONTRACTS_DIR layout load_contracts expects.
+    workdir = os.path.join(os.path.abspath(bench_dir), "corpora", f"contracts_{n_contracts}x{pages}_{seed}")
+    contracts_dir = os.path.join(workdir, "contracts")
+    if not os.path.isdir(contracts_dir) or len(os.listdir(contracts_dir)) != n_contracts:
+        shutil.rmtree(workdir, ignore_errors=True)
+        os.makedirs(contracts_dir)
+        for i in range(n_contracts):
+            write_synthetic_contract(os.path.join(contracts_dir, f"contract_{i:04d}.pdf"), pages, seed + i)
+    return workdir
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+# === SKU classification: row-wise apply vs vectorized ===
+def bench_sku_classification(n_rows, seed=0):
+    from sku_rationalization import classify_sku, classify_skus
+
+    df = synthetic_sku_metrics(n_rows, seed)
+    vectorized, vectorized_s = _timed(classify_skus, df)
+    row_wise, row_wise_s = _timed(lambda frame: frame.apply(classify_sku, axis=1), df)
+
+    mismatches = int((vectorized != row_wise).sum())
+    if mismatches:
+        raise AssertionError(f"classify_skus disagrees with classify_sku on {mismatches} rows")
+
+    return {
+        "benchmark": "sku-classify",
+        "rows": n_rows,
+        "row_wise_s": round(row_wise_s, 4),
+        "vectorized_s": round(vectorized_s, 4),
+        "speedup": round(row_wise_s / vectorized_s, 1),
+        "labels_identical": True,
+    }
+
+# === Stub Ollama server ===
+class StubOllama:
+    # Local stand-in for Ollama's /api/generate: waits `latency` seconds before
+    # the first token, then emits `tokens` tokens at `tokens_per_s`, reporting
+    # the same eval counters Ollama does. Supports streaming and non-streaming.
+    # `faults` are applied to the next requests in order: "drop" closes the
+    # connection without a response, "hang" sleeps `hang_s` before answering,
+    # an int answers with that HTTP status.
+    def __init__(self, latency=0.05, tokens=64, tokens_per_s=200.0, host="127.0.0.1", port=0,
+                 faults=(), hang_s=5.0):
+        stub = self
+        self.latency = latency
+        self.tokens = tokens
+        self.tokens_per_s = tokens_per_s
+        self.faults = list(faults)
+        self.hang_s = hang_s
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                if self.path != "/api/generate":
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with stub._lock:
+                    stub.requests += 1
+                    fault = stub.faults.pop(0) if stub.faults else None
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    if fault == "drop":
+                        self.close_connection = True
+                        return
+                    if fault == "hang":
+                        time.sleep(stub.hang_s)
+                    elif isinstance(fault, int):
+                        self.send_error(fault)
+                        return
+                    if body.get("stream", True):
+                        stub._stream(self, body)
+                    else:
+                        stub._respond(self, body)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # the client gave up (e.g. a read timeout)
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _final(self, body, response=""):
+        eval_duration = int(self.tokens / self.tokens_per_s * 1e9)
+        return {
+            "model": body.get("model", ""),
+            "response": response,
+            "done": True,
+            "prompt_eval_count": len(body.get("prompt", "")) // 4,
+            "eval_count": self.tokens,
+            "eval_duration": eval_duration,
+            "total_duration": int(self.latency * 1e9) + eval_duration,
+        }
+
+    def _respond(self, handler, body):
+        time.sleep(self.latency + self.tokens / self.tokens_per_s)
+        payload = json.dumps(self._final(body, " ".join(["token"] * self.tokens))).encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def _stream(self, handler, body):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        def send(event):
+            line = (json.dumps(event) + "\n").encode()
+            handler.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            handler.wfile.flush()
+
+        time.sleep(self.latency)
+        for _ in range(self.tokens):
+            send({"model": body.get("model", ""), "response": "token ", "done": False})
+            time.sleep(1 / self.tokens_per_s)
+        send(self._final(body))
+        handler.wfile.write(b"0\r\n\r\n")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+# === Module benchmarks (each case runs in its own child process) ===
+def _peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB
+
+def _percentiles(seconds):
+    if not seconds:
+        return None
+    ms = np.asarray(seconds) * 1000
+    return {
+        "p50": round(float(np.percentile(ms, 50)), 2),
+        "p90": round(float(np.percentile(ms, 90)), 2),
+        "p99": round(float(np.percentile(ms, 99)), 2),
+        "mean": round(float(ms.mean()), 2),
+        "min": round(float(ms.min()), 2),
+        "max": round(float(ms.max()), 2),
+    }
+
+def _case_target(module):
+    # (callable, reset) per module. reset() runs between warm repeats: it drops
+    # the in-process data cache but keeps on-disk stores (Parquet, FAISS index),
+    # which is what a fresh dashboard session sees.
+    import data_source
+
+    if module == "sku":
+        from sku_rationalization import get_sku_summary
+        return get_sku_summary, data_source.invalidate
+    if module == "sku-stream":
+        from sku_rationalization import get_sku_summary
+        return (lambda: get_sku_summary(streaming=True)), data_source.invalidate
+    if module == "scenario":
+        from scenario_planning import get_scenario_summary
+        return (lambda: get_scenario_summary(-15)), data_source.invalidate
+    if module == "procurement":
+        from load_contracts import get_procurement_summary
+        return get_procurement_summary, (lambda: None)
+    if module == "pipeline":
+        from agent_flow import run_pipeline
+        return run_pipeline, data_source.invalidate
+    raise ValueError(f"Unknown benchmark module: {module!r}")
+
+def run_case(module, repeats=5):
+    # Runs in the child: the first call is cold (builds Parquet/FAISS stores,
+    # loads the embedding model), the remaining repeats are warm.
+    from instrumentation import collect_spans, summarize_spans
+
+    fn, reset = _case_target(module)
+    latencies = []
+    stages = []
+    for i in range(repeats + 1):
+        if i:
+            reset()
+        with collect_spans() as spans:
+            start = time.perf_counter()
+            fn()
+            latencies.append(time.perf_counter() - start)
+        stages.append(summarize_spans(spans)["stages"])
+
+    warm_stages = {}
+    for run in stages[1:]:
+        for name, ms in run.items():
+            warm_stages[name] = warm_stages.get(name, 0.0) + ms / repeats
+    return {
+        "cold_s": round(latencies[0], 4),
+        "latency_ms": _percentiles(latencies[1:]),
+        "stages_cold_ms": {name: round(ms, 2) for name, ms in stages[0].items()},
+        "stages_warm_ms": {name: round(ms, 2) for name, ms in warm_stages.items()},
+        "peak_rss_bytes": _peak_rss_bytes(),
+    }
+
+def _spawn_case(case, repeats, llm_url, bench_dir):
+    # Fresh interpreter per case: isolated peak RSS, cold caches, and module
+    # constants (CSV path, index dir, Ollama URL) taken from the environment.
+    scratch = tempfile.mkdtemp(prefix="case_", dir=os.path.join(os.path.abspath(bench_dir), "runs"))
+    result_path = os.path.join(scratch, "result.json")
+    env = dict(
+        os.environ,
+        OLLAMA_URL=llm_url,
+        LLM_CACHE="0",
+        RESULT_CACHE="0",
+        TRACE_LOG_PATH="",
+        CONTRACT_INDEX_DIR=os.path.join(scratch, "contract_index"),
+        SUPPLY_CHAIN_PARQUET_DIR=os.path.join(scratch, "parquet"),
+    )
+    if case.get("csv"):
+        env["SUPPLY_CHAIN_CSV"] = case["csv"]
+    command = [
+        sys.executable, os.path.abspath(__file__), "case", case["module"],
+        "--repeats", str(repeats), "--result-file", result_path,
+    ]
+    try:
+        completed = subprocess.run(
+            command, cwd=case.get("workdir") or os.getcwd(), env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        if completed.returncode != 0:
+            return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed"}
+        with open(result_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+def _suite_cases(rows, contracts, pages, seed, bench_dir, modules):
+    # Data-driven modules scale with CSV rows, procurement with corpus size;
+    # the full pipeline uses each row count with the smallest corpus.
+    cases = []
+    for n_rows in rows:
+        csv_path = synthetic_dataset(n_rows, seed, bench_dir)
+        for module in ("sku", "sku-stream", "scenario"):
+            if module in modules:
+                cases.append({"module": module, "rows": n_rows, "csv": csv_path, "unit": "rows", "units": n_rows})
+    for n_contracts in contracts:
+        if "procurement" in modules:
+            workdir = synthetic_corpus(n_contracts, pages, seed, bench_dir)
+            cases.append({"module": "procurement", "contracts": n_contracts, "pages": pages,
+                          "workdir": workdir, "unit": "contracts", "units": n_contracts})
+    if "pipeline" in modules and contracts:
+        workdir = synthetic_corpus(min(contracts), pages, seed, bench_dir)
+        for n_rows in rows:
+            cases.append({"module": "pipeline", "rows": n_rows, "contracts": min(contracts), "pages": pages,
+                          "csv": synthetic_dataset(n_rows, seed, bench_dir), "workdir": workdir,
+                          "unit": "rows", "units": n_rows})
+    return cases
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+BENCH_MODULES = ("sku", "sku-stream", "scenario", "procurement", "pipeline")
+
+def run_suite(rows=(1_000, 10_000, 100_000, 1_000_000), contracts=(1, 8, 32), pages=5, repeats=5,
+              seed=0, llm_latency=0.05, llm_tokens=64, llm_tokens_per_s=200.0,
+              modules=BENCH_MODULES, bench_dir=BENCH_DIR):
+    os.makedirs(os.path.join(bench_dir, "runs"), exist_ok=True)
+    cases = _suite_cases(rows, contracts, pages, seed, bench_dir, modules)
+    results = []
+    with StubOllama(llm_latency, llm_tokens, llm_tokens_per_s) as stub:
+        for case in cases:
+            label = ", ".join(f"{k}={case[k]}" for k in ("rows", "contracts") if k in case)
+            print(f"⏱️ {case['module']} ({label})", file=sys.stderr)
+            measured = _spawn_case(case, repeats, stub.url, bench_dir)
+            result = {k: v for k, v in case.items() if k not in ("csv", "workdir", "units")}
+            result.update(measured)
+            if "error" not in measured:
+                result["cold_throughput_per_s"] = round(case["units"] / measured["cold_s"], 2)
+                if measured["latency_ms"]:
+                    result["warm_throughput_per_s"] = round(case["units"] / (measured["latency_ms"]["p50"] / 1000), 2)
+            results.append(result)
+        llm_requests = stub.requests
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeats": repeats,
+            "seed": seed,
+            "llm_stub": {"latency_s": llm_latency, "tokens": llm_tokens, "tokens_per_s": llm_tokens_per_s,
+                         "requests": llm_requests},
+        },
+        "results": results,
+    }
+
+def _case_key(result):
+    return (result["module"], result.get("rows"), result.get("contracts"), result.get("pages"))
+
+def compare_results(baseline, current):
+    # Rows of (case, metric, baseline, current, ratio) for cases present in both runs.
+    previous = {_case_key(r): r for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        before = previous.get(_case_key(result))
+        if before is None or "error" in before or "error" in result:
+            continue
+        metrics = {
+            "cold_s": (before["cold_s"], result["cold_s"]),
+            "p50_ms": ((before["latency_ms"] or {}).get("p50"), (result["latency_ms"] or {}).get("p50")),
+            "p99_ms": ((before["latency_ms"] or {}).get("p99"), (result["latency_ms"] or {}).get("p99")),
+            "peak_rss_mb": tuple(
+                r["peak_rss_bytes"] / 2**20 if r["peak_rss_bytes"] else None for r in (before, result)
+            ),
+        }
+        for metric, (old, new) in metrics.items():
+            if old and new is not None:
+                rows.append({"case": _case_key(result), "metric": metric, "baseline": old,
+                             "current": new, "ratio": round(new / old, 3)})
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Supply chain dashboard benchmarks")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    sku_parser = subcommands.add_parser("sku-classify", help="row-wise vs vectorized SKU classification")
+    sku_parser.add_argument("--rows", type=int, default=1_000_000)
+    sku_parser.add_argument("--seed", type=int, default=0)
+
+    suite_parser = subcommands.add_parser("suite", help="module benchmarks against synthetic data and a stub LLM")
+    suite_parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000],
+                              help="synthetic CSV sizes (up to 10000000)")
+    suite_parser.add_argument("--contracts", type=int, nargs="+", default=[1, 8, 32], help="synthetic corpus sizes")
+    suite_parser.add_argument("--pages", type=int, default=5, help="pages per synthetic contract")
+    suite_parser.add_argument("--modules", nargs="+", choices=BENCH_MODULES, default=list(BENCH_MODULES))
+    suite_parser.add_argument("--repeats", type=int, default=5, help="warm repeats after the cold run")
+    suite_parser.add_argument("--seed", type=int, default=0)
+    suite_parser.add_argument("--llm-latency", type=float, default=0.05, help="stub seconds before first token")
+    suite_parser.add_argument("--llm-tokens", type=int, default=64, help="stub tokens per response")
+    suite_parser.add_argument("--llm-tokens-per-s", type=float, default=200.0)
+    suite_parser.add_argument("--output", help="write JSON results here instead of stdout")
+
+    compare_parser = subcommands.add_parser("compare", help="diff two suite result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+
+    case_parser = subcommands.add_parser("case", help=argparse.SUPPRESS)  # child process of `suite`
+    case_parser.add_argument("module", choices=BENCH_MODULES)
+    case_parser.add_argument("--repeats", type=int, default=5)
+    case_parser.add_argument("--result-file", required=True)
+    args = parser.parse_args()
+
+    if args.command == "sku-classify":
+        result = bench_sku_classification(args.rows, args.seed)
+        print(f"✅ Labels identical on {result['rows']:,} rows")
+        print(f"⏱️ Row-wise apply: {result['row_wise_s']:.3f}s")
+        print(f"⚡ Vectorized:     {result['vectorized_s']:.3f}s  ({result['speedup']}x faster)")
+    elif args.command == "suite":
+        report = run_suite(
+            rows=args.rows, contracts=args.contracts, pages=args.pages, repeats=args.repeats,
+            seed=args.seed, llm_latency=args.llm_latency, llm_tokens=args.llm_tokens,
+            llm_tokens_per_s=args.llm_tokens_per_s, modules=args.modules,
+        )
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"✅ Wrote {len(report['results'])} results to {args.output}", file=sys.stderr)
+        else:
+            print(json.dumps(report, indent=2))
+    elif args.command == "compare":
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, "r", encoding="utf-8") as f:
+            current = json.load(f)
+        for row in compare_results(baseline, current):
+            marker = "🔺" if row["ratio"] > 1.1 else ("🔻" if row["ratio"] < 0.9 else "  ")
+            module, *sizes = row["case"]
+            label = " ".join([module] + [f"{k}={v}" for k, v in zip(("rows", "contracts", "pages"), sizes) if v is not None])
+            print(f"{marker} {label} {row['metric']}: {row['baseline']:.2f} → {row['current']:.2f} (x{row['ratio']})")
+    elif args.command == "case":
+        result = run_case(args.module, args.repeats)
+        with open(args.result_file, "w", encoding="utf-8") as f:
+            json.dump(result, f)
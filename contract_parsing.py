@@ -0,0 +1,23 @@
+# contract_parsing.py
+# PDF parsing and chunking, kept free of embedding/FAISS imports so that
+# process-pool workers spawned by load_contracts start quickly.
+
+import os
+
+from llama_index.core import SimpleDirectoryReader
+from llama_index.core.node_parser import SentenceSplitter
+
+from instrumentation import span
+
+CHUNK_SIZE = 1024
+CHUNK_OVERLAP = 100
+
+def chunk_contract(path):
+    with span("pdf.load", file=os.path.basename(path)) as s:
+        documents = SimpleDirectoryReader(input_files=[path]).load_data()
+        s["attributes"]["pages"] = len(documents)
+    with span("pdf.chunk", file=os.path.basename(path)) as s:
+        splitter = SentenceSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        nodes = splitter.get_nodes_from_documents(documents)
+        s["attributes"]["chunks"] = len(nodes)
+    return [node.text for node in nodes]
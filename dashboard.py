@@ -1,9 +1,22 @@
 import streamlit as st
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
-from agent_flow import procurement_node, scenario_node, sku_node, dashboard_node, AgentState
+from agent_flow import SUMMARY_HEADERS, AgentState, cached_state, scenario_params
+from data_source import data_version
+from embeddings import get_embedding_model
+from instrumentation import collect_spans, spans_table, summarize_spans
+from jobs import DONE, FAILED, get_runner, submit_pipeline, submit_summary
+from llm_cache import get_cache as get_llm_cache
+from result_cache import RESULT_CACHE_ADMIN, RESULT_CACHE_ENABLED, get_result_cache, lookup, store
+from scenario_planning import build_scenario, load_supply_chain_data, stream_scenario_summary, sweep_scenarios
+from risk_simulation import run_monte_carlo
+from sku_rationalization import (DISCONTINUE, KEEP, OPTIMIZE, load as load_sku_data, performance_matrix,
+                                 performance_matrix_stream, recommendation_counts,
+                                 stream_state as sku_stream_state, use_streaming)
+from supplier_scorecards import SCORECARD_GRAINS, supplier_scorecards
 
 # Configure Streamlit page
 st.set_page_config(
@@ -13,6 +26,174 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Load and warm up the embedding model once per server process
+@st.cache_resource(show_spinner="Loading embedding model...")
+def load_embedding_model():
+    return get_embedding_model(warm_up=True)
+
+load_embedding_model()
+
+RISK_TRIALS = 20_000
+
+# Keyed on the CSV's content hash so new data re-runs the simulation
+@st.cache_data(show_spinner="Running Monte Carlo risk simulation...")
+def run_risk_simulation(csv_version, n_trials):
+    return run_monte_carlo(n_trials=n_trials, seed=42)
+
+SKU_COLORS = {KEEP: '#28a745', OPTIMIZE: '#ffc107', DISCONTINUE: '#dc3545'}
+
+# Aggregated per data version; the charts get counts and a bounded point set.
+# Files past SKU_STREAM_MIN_BYTES are aggregated chunk by chunk, never loaded whole.
+@st.cache_data(show_spinner=False)
+def sku_chart_data(csv_version):
+    if use_streaming():
+        return sku_stream_state().recommendation_counts(), performance_matrix_stream()
+    df = load_sku_data()
+    return recommendation_counts(df), performance_matrix(df)
+
+# === Scenario narratives: generated off the script thread, cached per slider value ===
+@st.cache_resource
+def narrative_executor():
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="scenario-narrative")
+
+def _generate_narrative(job, demand_change):
+    try:
+        key, versions, cached = lookup("scenario_summary", scenario_params(demand_change))
+        if cached is not None:
+            job["pieces"].append(cached)
+            return
+        for token in stream_scenario_summary(demand_change):
+            if job["cancelled"]:
+                return  # superseded by a newer slider value; stop reading the stream
+            job["pieces"].append(token)
+        store(key, "scenario_summary", versions, "".join(job["pieces"]), scenario_params(demand_change))
+    except Exception as e:
+        job["error"] = str(e)
+    finally:
+        job["done"] = True
+
+def scenario_narrative_job(demand_change):
+    # Only the latest slider value keeps a narrative in flight: unfinished ones
+    # for other values are cancelled and dropped, so dragging the slider costs
+    # one LLM call instead of one per value passed on the way.
+    jobs = st.session_state.scenario_narratives
+    for value, job in list(jobs.items()):
+        if value != demand_change and not job["done"]:
+            job["cancelled"] = True
+            job["future"].cancel()
+            del jobs[value]
+    if demand_change not in jobs:
+        job = {"pieces": [], "done": False, "error": None, "cancelled": False}
+        job["future"] = narrative_executor().submit(_generate_narrative, job, demand_change)
+        jobs[demand_change] = job
+    return jobs[demand_change]
+
+def render_narrative(job):
+    text = SUMMARY_HEADERS['scenario_summary'] + "".join(job["pieces"])
+    if job["error"]:
+        st.error(f"Error during analysis: {job['error']}")
+    elif job["done"]:
+        st.text_area(
+            "Scenario Analysis Results",
+            value=text,
+            height=400,
+            help="AI-generated insights on demand change scenario impacts"
+        )
+    else:
+        st.caption("⏳ Generating scenario narrative...")
+        st.text(text)
+
+# Re-renders just this block until the narrative finishes, then hands back to a full rerun
+@st.fragment(run_every=0.5)
+def poll_narrative(demand_change):
+    job = st.session_state.scenario_narratives.get(demand_change)
+    if job is None:  # superseded by a newer slider value
+        st.rerun()
+    render_narrative(job)
+    if job["done"]:
+        st.rerun()
+
+# === Complete analysis: runs as a background job, this page only polls it ===
+def apply_pipeline_result(state, spans):
+    state = AgentState(**state)  # own copy; coalesced sessions share the job's result
+    demand_change = state['demand_change']
+    # Seed the per-slider narrative cache with the pipeline's result
+    narrative = state['scenario_summary'].removeprefix(SUMMARY_HEADERS['scenario_summary'])
+    st.session_state.scenario_narratives = {
+        demand_change: {"pieces": [narrative], "done": True, "error": None}
+    }
+    st.session_state.pipeline_spans = spans
+    st.session_state.analysis_data = state
+    st.session_state.analysis_complete = True
+
+@st.fragment(run_every=0.5)
+def poll_analysis_job(job_id):
+    job = get_runner().get(job_id)
+    if job is None:
+        st.session_state.analysis_job = None
+        st.session_state.analysis_notice = ("error", "Analysis job expired before it finished")
+        st.rerun()
+    if job["status"] not in (DONE, FAILED):
+        st.progress(job["progress"], text=job["message"])
+        if job["requests"] > 1:
+            st.caption(f"👥 Shared with {job['requests'] - 1} other request(s) for the same data and parameters")
+        return
+    st.session_state.analysis_job = None
+    if job["status"] == FAILED:
+        st.session_state.analysis_notice = ("error", f"Error during analysis: {job['error']}")
+    else:
+        apply_pipeline_result(job["result"], job["spans"])
+        st.session_state.analysis_notice = ("success", "Analysis completed successfully! ✅")
+    st.rerun()
+
+def render_timing(metric_slot, panel, spans):
+    # Filled in at the end of the script so streamed tabs are included
+    summary = summarize_spans(spans)
+    if not spans:
+        metric_slot.metric(label="⚡ Processing Time", value="—", delta="No timed runs yet", delta_color="off")
+        return
+    throughput = f"{summary['tokens_per_s']:.1f} tok/s" if summary['tokens_per_s'] else "cached"
+    metric_slot.metric(
+        label="⚡ Processing Time",
+        value=f"{summary['wall_ms'] / 1000:.1f}s",
+        delta=f"{summary['llm_calls']} LLM calls · {throughput}",
+        delta_color="off"
+    )
+    with panel.expander("⏱️ Pipeline Timing", expanded=False):
+        stages = pd.DataFrame(
+            sorted(summary['stages'].items(), key=lambda item: item[1], reverse=True),
+            columns=['Stage', 'Total (ms)']
+        )
+        fig_timing = px.bar(stages, x='Total (ms)', y='Stage', orientation='h', title='Time per Stage')
+        fig_timing.update_layout(yaxis={'autorange': 'reversed'})
+        st.plotly_chart(fig_timing, use_container_width=True)
+        st.dataframe(pd.DataFrame(spans_table(spans)), use_container_width=True, hide_index=True)
+
+# Streamed mode: each summary is a background job buffering its tokens; this
+# block shows the text so far and stores the full summary once the job ends.
+@st.fragment(run_every=0.5)
+def poll_summary_job(key):
+    data = st.session_state.analysis_data
+    job_id = st.session_state.summary_jobs.get(key)
+    job = get_runner().get(job_id) if job_id else None
+    if job is None:
+        data[key] = ""
+        st.session_state.analysis_notice = ("error", "Analysis job expired before it finished")
+        st.rerun()
+    if job["status"] not in (DONE, FAILED):
+        st.caption(f"⏳ {job['message']}...")
+        if job["requests"] > 1:
+            st.caption(f"👥 Shared with {job['requests'] - 1} other request(s) for the same data")
+        st.text(job["output"])
+        return
+    st.session_state.pipeline_spans.extend(job["spans"])
+    if job["status"] == FAILED:
+        data[key] = ""
+        st.session_state.analysis_notice = ("error", f"Error during analysis: {job['error']}")
+    else:
+        data[key] = SUMMARY_HEADERS[key] + job["result"]
+    st.rerun()
+
 # Custom CSS for better styling
 st.markdown("""
 <style>
@@ -64,6 +245,15 @@ st.markdown("""
 if 'analysis_complete' not in st.session_state:
     st.session_state.analysis_complete = False
     st.session_state.analysis_data = None
+if 'scenario_narratives' not in st.session_state:
+    st.session_state.scenario_narratives = {}  # demand change % -> narrative job
+if 'pipeline_spans' not in st.session_state:
+    st.session_state.pipeline_spans = []  # spans from the last analysis run
+if 'summary_jobs' not in st.session_state:
+    st.session_state.summary_jobs = {}  # summary key -> id of its streaming job
+if 'analysis_job' not in st.session_state:
+    st.session_state.analysis_job = None  # id of the background analysis being polled
+    st.session_state.analysis_notice = None  # (kind, message) from the last finished job
 
 # Header
 st.markdown('<h1 class="main-header">🏭 Supply Chain Intelligence Dashboard</h1>', unsafe_allow_html=True)
@@ -72,47 +262,12 @@ st.markdown('<h1 class="main-header">🏭 Supply Chain Intelligence Dashboard</h
 with st.sidebar:
     st.header("🔧 Dashboard Controls")
     
-    # Analysis trigger
-    if st.button("🔄 Run Complete Analysis", type="primary", use_container_width=True):
-        with st.spinner("Analyzing supply chain data..."):
-            try:
-                # Initialize state
-                state = AgentState(
-                    scenario_summary=None,
-                    sku_summary=None,
-                    procurement_summary=None
-                )
-                
-                # Run analysis nodes
-                progress_bar = st.progress(0)
-                
-                # Procurement Analysis
-                st.text("Running procurement analysis...")
-                state = procurement_node(state)
-                progress_bar.progress(25)
-                
-                # Scenario Planning
-                st.text("Running scenario planning...")
-                state = scenario_node(state)
-                progress_bar.progress(50)
-                
-                # SKU Rationalization
-                st.text("Running SKU rationalization...")
-                state = sku_node(state)
-                progress_bar.progress(75)
-                
-                # Final Dashboard
-                st.text("Generating final dashboard...")
-                state = dashboard_node(state)
-                progress_bar.progress(100)
-                
-                st.session_state.analysis_data = state
-                st.session_state.analysis_complete = True
-                st.success("Analysis completed successfully! ✅")
-                
-            except Exception as e:
-                st.error(f"Error during analysis: {str(e)}")
-    
+    stream_llm = st.toggle(
+        "⚡ Stream LLM output",
+        value=True,
+        help="Show insights in each tab token by token instead of waiting for the full pipeline"
+    )
+
     # Scenario Planning Controls
     st.subheader("📈 Scenario Parameters")
     scenario_change = st.slider(
@@ -124,6 +279,64 @@ with st.sidebar:
         help="Adjust demand change percentage for scenario analysis"
     )
     
+    # Analysis trigger
+    run_clicked = st.button("🔄 Run Complete Analysis", type="primary", use_container_width=True)
+    if run_clicked and stream_llm:
+        # Both summaries stream in parallel as background jobs; their tabs poll
+        # them. The scenario narrative follows the slider on its own.
+        st.session_state.analysis_data = AgentState(
+            demand_change=scenario_change,
+            scenario_summary=None,
+            sku_summary=None,
+            procurement_summary=None,
+            final_dashboard=None,
+        )
+        st.session_state.analysis_complete = True
+        st.session_state.scenario_narratives = {}
+        st.session_state.pipeline_spans = []
+        st.session_state.analysis_job = None
+        st.session_state.summary_jobs = {}
+        try:
+            st.session_state.summary_jobs = {
+                key: submit_summary(key) for key in ('sku_summary', 'procurement_summary')
+            }
+        except Exception as e:
+            st.error(f"Error during analysis: {str(e)}")
+    elif run_clicked:
+        # Served instantly when every summary is in the shared result cache;
+        # otherwise the three analyses run in parallel through the LangGraph
+        # pipeline on the shared job runner, and identical in-flight requests
+        # share one job.
+        try:
+            with collect_spans() as lookup_spans:
+                state = cached_state(scenario_change)
+            if state is not None:
+                apply_pipeline_result(state, lookup_spans)
+                st.session_state.analysis_job = None
+                st.session_state.analysis_notice = ("success", "Analysis loaded from cached results ✅")
+            else:
+                st.session_state.analysis_job = submit_pipeline(scenario_change)
+                st.session_state.analysis_notice = None
+        except Exception as e:
+            st.error(f"Error during analysis: {str(e)}")
+
+    if st.session_state.analysis_job:
+        poll_analysis_job(st.session_state.analysis_job)
+    elif st.session_state.analysis_notice:
+        kind, message = st.session_state.analysis_notice
+        st.session_state.analysis_notice = None  # shown once, like an inline result
+        (st.success if kind == "success" else st.error)(message)
+    
+    if RESULT_CACHE_ENABLED:
+        st.markdown("---")
+        st.caption(f"💾 {get_result_cache().stats()['entries']} cached results shared across sessions")
+        # Clearing affects every session, so only admins (RESULT_CACHE_ADMIN=1) get the button
+        if RESULT_CACHE_ADMIN and st.button("🗑️ Clear Cached Results", use_container_width=True,
+                     help="Drop stored summaries and LLM responses so the next run regenerates them"):
+            get_result_cache().clear()
+            get_llm_cache().clear()
+            st.rerun()
+
     # Refresh timestamp
     st.markdown("---")
     st.caption(f"Last Updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -156,11 +369,7 @@ if st.session_state.analysis_complete and st.session_state.analysis_data:
             )
         
         with col3:
-            st.metric(
-                label="⚡ Processing Time",
-                value="< 30s",
-                delta="Real-time analysis"
-            )
+            processing_time_slot = st.empty()
         
         with col4:
             st.metric(
@@ -182,10 +391,25 @@ if st.session_state.analysis_complete and st.session_state.analysis_data:
         """
         
         st.markdown(executive_summary)
+
+        # Scorecards come from the materialized aggregates; refresh only folds in appended rows
+        st.subheader("🏭 Supplier Scorecards")
+        grain = st.radio("Group by", list(SCORECARD_GRAINS), horizontal=True,
+                         format_func=lambda g: "Supplier" if g == "supplier" else "Supplier × Location × Carrier")
+        st.dataframe(
+            supplier_scorecards(grain),
+            use_container_width=True,
+            hide_index=True,
+            column_config={"Fail Rate": st.column_config.ProgressColumn("Fail Rate", format="%.2f", min_value=0, max_value=1)},
+        )
+        timing_panel = st.container()
     
     with tab2:
         st.markdown('<h2 class="section-header">SKU Rationalization Analysis</h2>', unsafe_allow_html=True)
         
+        if data.get('sku_summary') is None:
+            poll_summary_job('sku_summary')
+
         if data.get('sku_summary'):
             # Display SKU summary
             st.text_area(
@@ -195,50 +419,34 @@ if st.session_state.analysis_complete and st.session_state.analysis_data:
                 help="AI-generated insights on SKU performance and recommendations"
             )
             
-            # Mock data for visualization (in real implementation, you'd parse the actual data)
+            # Charts from the rationalized data, aggregated before plotting
+            sku_counts, sku_matrix = sku_chart_data(data_version())
             col1, col2 = st.columns(2)
             
             with col1:
                 # SKU Performance Distribution
-                sku_data = {
-                    'Status': ['Keep', 'Bundle/Optimize', 'Discontinue'],
-                    'Count': [12, 8, 5],
-                    'Percentage': [48, 32, 20]
-                }
-                
                 fig_pie = px.pie(
-                    values=sku_data['Count'],
-                    names=sku_data['Status'],
+                    sku_counts,
+                    values='Count',
+                    names='Recommendation',
+                    color='Recommendation',
                     title="SKU Recommendation Distribution",
-                    color_discrete_map={
-                        'Keep': '#28a745',
-                        'Bundle/Optimize': '#ffc107',
-                        'Discontinue': '#dc3545'
-                    }
+                    color_discrete_map=SKU_COLORS
                 )
                 st.plotly_chart(fig_pie, use_container_width=True)
             
             with col2:
-                # Performance Metrics
-                metrics_data = pd.DataFrame({
-                    'SKU': ['SKU001', 'SKU002', 'SKU003', 'SKU004', 'SKU005'],
-                    'Profit_Margin': [0.35, 0.15, 0.05, 0.28, 0.12],
-                    'Sales_Velocity': [1.5, 0.8, 0.3, 1.2, 0.6],
-                    'Status': ['Keep', 'Bundle/Optimize', 'Discontinue', 'Keep', 'Bundle/Optimize']
-                })
-                
+                # Performance Metrics (one point per SKU, or per bin on large catalogs)
+                binned = bool((sku_matrix['Count'] > 1).any())
                 fig_scatter = px.scatter(
-                    metrics_data,
-                    x='Sales_Velocity',
-                    y='Profit_Margin',
-                    color='Status',
-                    title='SKU Performance Matrix',
-                    labels={'Sales_Velocity': 'Sales Velocity', 'Profit_Margin': 'Profit Margin'},
-                    color_discrete_map={
-                        'Keep': '#28a745',
-                        'Bundle/Optimize': '#ffc107',
-                        'Discontinue': '#dc3545'
-                    }
+                    sku_matrix,
+                    x='Sales Velocity',
+                    y='Profit Margin',
+                    color='SKU Recommendation',
+                    size='Count' if binned else None,
+                    hover_data=['Count'] if binned else ['SKU'],
+                    title='SKU Performance Matrix' + (' (binned)' if binned else ''),
+                    color_discrete_map=SKU_COLORS
                 )
                 st.plotly_chart(fig_scatter, use_container_width=True)
         else:
@@ -247,47 +455,68 @@ if st.session_state.analysis_complete and st.session_state.analysis_data:
     with tab3:
         st.markdown('<h2 class="section-header">Scenario Planning Results</h2>', unsafe_allow_html=True)
         
-        if data.get('scenario_summary'):
-            # Display scenario analysis
-            st.text_area(
-                "Scenario Analysis Results",
-                value=data['scenario_summary'],
-                height=400,
-                help="AI-generated insights on demand change scenario impacts"
+        # KPIs recompute synchronously from the cached base data on every slider move
+        kpis = build_scenario(scenario_change).kpis()
+        base_kpis = build_scenario(0).kpis()
+        kpi_col1, kpi_col2, kpi_col3 = st.columns(3)
+        with kpi_col1:
+            st.metric(
+                label="💰 Total Revenue",
+                value=f"${kpis['total_revenue']:,.0f}",
+                delta=f"${kpis['total_revenue'] - base_kpis['total_revenue']:,.0f} vs base"
             )
-            
-            # Scenario impact visualization
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                # Revenue Impact Chart
-                scenarios = ['Base Case', 'Demand -15%', 'Demand -30%', 'Demand +15%', 'Demand +30%']
-                revenue_impact = [1000000, 850000, 700000, 1150000, 1300000]
-                
-                fig_bar = go.Figure(data=[
-                    go.Bar(x=scenarios, y=revenue_impact, 
-                          marker_color=['blue', 'red', 'darkred', 'green', 'darkgreen'])
-                ])
-                fig_bar.update_layout(title='Revenue Impact by Scenario')
-                st.plotly_chart(fig_bar, use_container_width=True)
-            
-            with col2:
-                # Risk Assessment
-                st.subheader("🚨 Risk Assessment")
-                risk_data = {
-                    'Risk Factor': ['Demand Volatility', 'Supply Disruption', 'Cost Inflation', 'Lead Time Extension'],
-                    'Impact': ['High', 'Medium', 'Medium', 'Low'],
-                    'Probability': [0.7, 0.4, 0.6, 0.3]
-                }
-                
-                risk_df = pd.DataFrame(risk_data)
-                st.dataframe(risk_df, use_container_width=True)
+        with kpi_col2:
+            st.metric(label="⏱️ Avg Lead Time", value=f"{kpis['avg_lead_time']:.1f} days")
+        with kpi_col3:
+            st.metric(label="🚚 Avg Shipping Cost", value=f"${kpis['avg_shipping_cost']:.2f}")
+
+        # LLM narrative for this slider value, generated in the background
+        narrative_job = scenario_narrative_job(scenario_change)
+        if narrative_job["done"]:
+            render_narrative(narrative_job)
         else:
-            st.warning("Scenario analysis data not available. Please run the analysis.")
+            poll_narrative(scenario_change)
+
+        # Scenario impact visualization
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            # Revenue Impact Chart (one vectorized sweep over the real data)
+            demand_changes = [0, -15, -30, 15, 30]
+            sweep = sweep_scenarios(load_supply_chain_data(), demand_changes=demand_changes)
+            scenarios = ['Base Case' if d == 0 else f"Demand {d:+d}%" for d in demand_changes]
+            revenue_impact = sweep['Total Revenue'].tolist()
+            
+            fig_bar = go.Figure(data=[
+                go.Bar(x=scenarios, y=revenue_impact, 
+                      marker_color=['blue', 'red', 'darkred', 'green', 'darkgreen'])
+            ])
+            fig_bar.update_layout(title='Revenue Impact by Scenario')
+            st.plotly_chart(fig_bar, use_container_width=True)
+        
+        with col2:
+            # Risk Assessment (Monte Carlo over fitted demand/lead time/shipping shocks)
+            st.subheader("🚨 Risk Assessment")
+            risk = run_risk_simulation(data_version(), RISK_TRIALS)
+            portfolio = risk['portfolio']
+            st.metric(
+                label=f"Revenue at Risk (VaR 95%, {portfolio['trials']:,} trials)",
+                value=f"${portfolio['revenue_var95']:,.0f}",
+                delta=f"{portfolio['prob_revenue_below_base']:.0%} chance below base",
+                delta_color="off"
+            )
+            risk_df = risk['supplier'][[
+                'Supplier name', 'Revenue P5', 'Revenue P50', 'Revenue P95',
+                'Revenue VaR95', 'Lead Time P95'
+            ]]
+            st.dataframe(risk_df.round(1), use_container_width=True)
     
     with tab4:
         st.markdown('<h2 class="section-header">Procurement Contract Analysis</h2>', unsafe_allow_html=True)
         
+        if data.get('procurement_summary') is None:
+            poll_summary_job('procurement_summary')
+
         if data.get('procurement_summary'):
             # Display procurement analysis
             st.text_area(
@@ -342,6 +571,8 @@ if st.session_state.analysis_complete and st.session_state.analysis_data:
         else:
             st.warning("Procurement analysis data not available. Please run the analysis.")
 
+    render_timing(processing_time_slot, timing_panel, st.session_state.pipeline_spans)
+
 else:
     # Landing page when no analysis has been run
     st.markdown("---")
@@ -0,0 +1,243 @@
+# data_source.py
+# Lazily-loaded, cached access to the historical data files. Nothing is read at
+# import time; a cached result is reused until the file's content changes.
+
+import glob
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+
+from instrumentation import span
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet store is optional; loaders fall back to typed CSV reads
+    pa = pq = None
+
+DATA_DIR = os.environ.get("SUPPLY_CHAIN_DATA_DIR", "./historical data")
+SUPPLY_CHAIN_CSV = os.environ.get("SUPPLY_CHAIN_CSV", os.path.join(DATA_DIR, "supply_chain_data.csv"))
+PARQUET_DIR = os.environ.get("SUPPLY_CHAIN_PARQUET_DIR", "./.cache/parquet")
+CSV_CHUNK_ROWS = 1_000_000
+
+# Explicit dtypes for supply_chain_data.csv: categoricals for repeated labels,
+# int32 for counts. Decimals stay float64: they are printed in prompts and
+# compared against rule thresholds, and float32 would change both.
+SUPPLY_CHAIN_DTYPES = {
+    'Product type': 'category',
+    'SKU': 'str',
+    'Price': 'float64',
+    'Availability': 'int32',
+    'Number of products sold': 'int32',
+    'Revenue generated': 'float64',
+    'Customer demographics': 'category',
+    'Stock levels': 'int32',
+    'Lead times': 'int32',
+    'Order quantities': 'int32',
+    'Shipping times': 'int32',
+    'Shipping carriers': 'category',
+    'Shipping costs': 'float64',
+    'Supplier name': 'category',
+    'Location': 'category',
+    'Lead time': 'int32',
+    'Production volumes': 'int32',
+    'Manufacturing lead time': 'int32',
+    'Manufacturing costs': 'float64',
+    'Inspection results': 'category',
+    'Defect rates': 'float64',
+    'Transportation modes': 'category',
+    'Routes': 'category',
+    'Costs': 'float64',
+}
+
+_cache = {}
+_versions = {}  # path -> (signature, content hash) for data_version
+_locks = {}
+_locks_guard = threading.Lock()
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def _lock_for(key):
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+def load_cached(path, loader, refresh=False, variant=None):
+    # Returns loader(path), or loader(path, variant) when a variant is given. The cheap (mtime, size) signature is checked first;
+    # if it moved, the content hash decides whether the file really changed
+    # (a touch or copy-in-place keeps the cached result).
+    key = (os.path.abspath(path), loader, variant)
+    with _lock_for(key):
+        signature = file_signature(path)
+        entry = _cache.get(key)
+        if entry and not refresh:
+            if entry["signature"] == signature:
+                return entry["data"]
+            content_hash = file_hash(path)
+            if content_hash == entry["hash"]:
+                entry["signature"] = signature
+                return entry["data"]
+        else:
+            content_hash = file_hash(path)
+
+        with span("data.load", file=os.path.basename(path), loader=loader.__name__):
+            data = loader(path) if variant is None else loader(path, variant)
+        _cache[key] = {"signature": signature, "hash": content_hash, "data": data}
+        return data
+
+def data_version(path=SUPPLY_CHAIN_CSV):
+    # Content hash of a data file, reusing the cached hash while mtime/size are unchanged.
+    signature = file_signature(path)
+    for (cached_path, _, _), entry in list(_cache.items()):
+        if cached_path == os.path.abspath(path) and entry["signature"] == signature:
+            return entry["hash"]
+    known = _versions.get(os.path.abspath(path))
+    if known and known[0] == signature:
+        return known[1]
+    content_hash = file_hash(path)
+    _versions[os.path.abspath(path)] = (signature, content_hash)
+    return content_hash
+
+def invalidate(path=None):
+    with _locks_guard:
+        for key in list(_cache):
+            if path is None or key[0] == os.path.abspath(path):
+                del _cache[key]
+
+# === Columnar (Parquet) store ===
+def _arrow_type(dtype):
+    return {
+        'float64': pa.float64(), 'float32': pa.float32(), 'int32': pa.int32(),
+    }.get(dtype, pa.string())  # categoricals/strings are stored dictionary-encoded
+
+def parquet_path(csv_path):
+    # Keyed on the CSV's absolute path, so same-named files in different
+    # directories get separate stores.
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    path_hash = hashlib.sha256(os.path.abspath(csv_path).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(PARQUET_DIR, f"{name}-{path_hash}.parquet")
+
+def _csv_read_dtypes(dtypes):
+    # Chunks are read with categoricals as plain strings so every chunk has the
+    # same Arrow schema; the dictionary encoding happens in the Parquet file.
+    return {col: ('str' if dtype == 'category' else dtype) for col, dtype in dtypes.items()}
+
+def convert_to_parquet(csv_path, dtypes=None):
+    # Streams the CSV in chunks into one Parquet file. Without dtypes (the
+    # supplier files) every column is kept as text.
+    if pq is None:
+        raise ImportError("pyarrow is required to build the Parquet store")
+    os.makedirs(PARQUET_DIR, exist_ok=True)
+    target = parquet_path(csv_path)
+    tmp_target = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    source_mtime_ns, source_size = file_signature(csv_path)  # taken first: a later edit reads as stale
+    source_hash = file_hash(csv_path)
+
+    reader = pd.read_csv(
+        csv_path,
+        dtype=_csv_read_dtypes(dtypes) if dtypes else str,
+        encoding="utf-8-sig",
+        chunksize=CSV_CHUNK_ROWS,
+    )
+    writer = None
+    try:
+        for chunk in reader:
+            if writer is None:
+                schema = pa.schema([
+                    (col, _arrow_type((dtypes or {}).get(col, 'str'))) for col in chunk.columns
+                ])
+                writer = pq.ParquetWriter(tmp_target, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError(f"{csv_path} has no rows to convert")
+
+    os.replace(tmp_target, target)
+    meta = {"source": os.path.abspath(csv_path), "source_hash": source_hash,
+            "source_size": source_size, "source_mtime_ns": source_mtime_ns}
+    with open(tmp_target, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_target, target + ".json")
+    return target
+
+def _parquet_is_fresh(csv_path):
+    # Fresh when the store was built from this exact CSV and its size/mtime
+    # still match; if they moved, the content hash decides.
+    target = parquet_path(csv_path)
+    meta_path = target + ".json"
+    if not (os.path.exists(target) and os.path.exists(meta_path)):
+        return False
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("source") != os.path.abspath(csv_path):
+        return False
+    if (meta.get("source_mtime_ns"), meta.get("source_size")) == file_signature(csv_path):
+        return True
+    return meta.get("source_hash") == file_hash(csv_path)
+
+def ingest_historical_data(data_dir=DATA_DIR):
+    # Converts every CSV in historical data/ to Parquet, skipping up-to-date ones.
+    converted = []
+    for csv_path in sorted(glob.glob(os.path.join(data_dir, "*.csv"))):
+        if _parquet_is_fresh(csv_path):
+            continue
+        typed = os.path.basename(csv_path) == os.path.basename(SUPPLY_CHAIN_CSV)
+        converted.append(convert_to_parquet(csv_path, SUPPLY_CHAIN_DTYPES if typed else None))
+    return converted
+
+def read_supply_chain(path=SUPPLY_CHAIN_CSV, columns=None):
+    # Reads only `columns`, from Parquet when available (converting on first
+    # use or when the CSV changed), else from the CSV with explicit dtypes.
+    columns = list(columns) if columns else None
+    categorical = [
+        col for col, dtype in SUPPLY_CHAIN_DTYPES.items()
+        if dtype == 'category' and (columns is None or col in columns)
+    ]
+    if pq is not None:
+        # Parallel pipeline nodes can hit a stale store at the same time; convert once.
+        with _lock_for(("parquet", os.path.abspath(path))):
+            if not _parquet_is_fresh(path):
+                with span("data.parquet_convert", file=os.path.basename(path)):
+                    convert_to_parquet(path, SUPPLY_CHAIN_DTYPES)
+        table = pq.read_table(parquet_path(path), columns=columns, read_dictionary=categorical)
+        return table.to_pandas()
+
+    dtypes = {col: dtype for col, dtype in SUPPLY_CHAIN_DTYPES.items() if columns is None or col in columns}
+    return pd.read_csv(path, usecols=columns, dtype=dtypes)
+
+def iter_supply_chain(path=SUPPLY_CHAIN_CSV, columns=None, chunk_rows=CSV_CHUNK_ROWS):
+    # Yields the file as DataFrames of at most chunk_rows rows, in file order,
+    # with the same dtypes as read_supply_chain (categoricals come back as str).
+    # A fresh Parquet store is read batch by batch; otherwise the CSV is
+    # streamed directly rather than converted first.
+    columns = list(columns) if columns else None
+    if pq is not None and _parquet_is_fresh(path):
+        parquet = pq.ParquetFile(parquet_path(path))
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    dtypes = {col: dtype for col, dtype in SUPPLY_CHAIN_DTYPES.items() if columns is None or col in columns}
+    yield from pd.read_csv(path, usecols=columns, dtype=_csv_read_dtypes(dtypes), chunksize=chunk_rows)
+
+def load_supply_chain(columns=None, path=SUPPLY_CHAIN_CSV, refresh=False):
+    # Cached per column set; callers must not mutate the returned frame.
+    columns = tuple(columns) if columns else None
+    return load_cached(path, read_supply_chain, refresh, variant=columns)
+
+if __name__ == "__main__":
+    for target in ingest_historical_data():
+        print(f"✅ Wrote {target}")
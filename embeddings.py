@@ -0,0 +1,56 @@
+# embeddings.py
+# Process-wide SentenceTransformer registry shared by every module that embeds text.
+
+import os
+import threading
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from instrumentation import span
+
+EMBEDDING_MODEL_NAME = os.environ.get("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+ENCODE_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "64"))
+ENCODE_THREADS = int(os.environ.get("EMBEDDING_THREADS", "0"))  # 0 = torch default
+
+_models = {}
+_lock = threading.Lock()
+
+# === Model registry ===
+def get_embedding_model(name: str = EMBEDDING_MODEL_NAME, warm_up: bool = False):
+    # Loaded at most once per process; later calls return the cached instance.
+    with _lock:
+        model = _models.get(name)
+        if model is None:
+            with span("embedding.model_load", model=name, warm_up=warm_up):
+                model = SentenceTransformer(name)
+                _models[name] = model
+                if warm_up:
+                    warm_up_model(model)
+    return model
+
+def warm_up_model(model, batch_size: int = ENCODE_BATCH_SIZE):
+    # One dummy batch so the first real request doesn't pay kernel/allocator setup.
+    encode(["warm-up"] * batch_size, model=model, batch_size=batch_size)
+
+def _set_threads(num_threads):
+    if not num_threads:
+        return
+    import torch
+    if torch.get_num_threads() != num_threads:
+        torch.set_num_threads(num_threads)
+
+# === Encoding ===
+def encode(texts, model=None, batch_size: int = ENCODE_BATCH_SIZE, num_threads: int = ENCODE_THREADS):
+    if model is None:
+        model = get_embedding_model()
+    _set_threads(num_threads)
+    texts = list(texts)
+    with span("embedding.encode", texts=len(texts), batch_size=batch_size):
+        embeddings = model.encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+    return np.asarray(embeddings, dtype="float32")
@@ -0,0 +1,166 @@
+# instrumentation.py
+# Lightweight tracing for the agent pipeline. Spans use OpenTelemetry field
+# names (trace_id, span_id, parent_span_id, start/end_time_unix_nano,
+# attributes, status) and go to any in-process collector opened with
+# collect_spans() (used by the dashboard) and, when TRACE_LOG_PATH is set, are
+# appended as JSON lines to that file, rotated once it reaches TRACE_LOG_MAX_BYTES.
+
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_LOG_PATH = os.environ.get("TRACE_LOG_PATH", "")  # off by default, e.g. ./.cache/traces.jsonl
+TRACE_LOG_MAX_BYTES = int(os.environ.get("TRACE_LOG_MAX_BYTES", str(50 * 1024 ** 2)))  # one .1 backup is kept
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_collector = contextvars.ContextVar("span_collector", default=None)
+_file_lock = threading.Lock()
+_file = None  # open handle on TRACE_LOG_PATH, guarded by _file_lock
+
+# === Span lifecycle ===
+def start_span(name, **attributes):
+    # Creates a span under the current one without making it current; pair
+    # with end_span(). Use this where a context manager can't wrap the work
+    # (e.g. across generator yields, which share the caller's context).
+    parent = _current_span.get()
+    return {
+        "trace_id": parent["trace_id"] if parent else secrets.token_hex(16),
+        "span_id": secrets.token_hex(8),
+        "parent_span_id": parent["span_id"] if parent else None,
+        "name": name,
+        "start_time_unix_nano": time.time_ns(),
+        "end_time_unix_nano": None,
+        "duration_ms": None,
+        "attributes": dict(attributes),
+        "status": "OK",
+        "_start_perf_ns": time.perf_counter_ns(),
+        "_collector": _collector.get(),
+    }
+
+def elapsed_ms(record):
+    # Time since an open span started, e.g. for time-to-first-token.
+    return round((time.perf_counter_ns() - record["_start_perf_ns"]) / 1e6, 1)
+
+def end_span(record, error=None):
+    elapsed_ns = time.perf_counter_ns() - record.pop("_start_perf_ns")
+    record["end_time_unix_nano"] = record["start_time_unix_nano"] + elapsed_ns
+    record["duration_ms"] = elapsed_ns / 1e6
+    if error is not None:
+        record["status"] = "ERROR"
+        record["attributes"]["exception"] = repr(error)
+    _export(record, record.pop("_collector"))
+    return record
+
+@contextmanager
+def span(name, **attributes):
+    # Yields the span dict; add attributes via record["attributes"][key] = value.
+    record = start_span(name, **attributes)
+    token = _current_span.set(record)
+    error = None
+    try:
+        yield record
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_span.reset(token)
+        end_span(record, error)
+
+def traced(name=None):
+    def decorator(fn):
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def set_attributes(**attributes):
+    # Adds attributes to the current span, if any.
+    record = _current_span.get()
+    if record is not None:
+        record["attributes"].update(attributes)
+
+# === Export ===
+def _export(record, collector):
+    global _file
+    if collector is not None:
+        collector.append(record)
+    if TRACE_LOG_PATH:
+        line = json.dumps(record, default=str) + "\n"
+        with _file_lock:
+            if _file is not None and _file.tell() + len(line) > TRACE_LOG_MAX_BYTES:
+                _file.close()
+                os.replace(TRACE_LOG_PATH, TRACE_LOG_PATH + ".1")
+                _file = None
+            if _file is None:
+                os.makedirs(os.path.dirname(TRACE_LOG_PATH) or ".", exist_ok=True)
+                _file = open(TRACE_LOG_PATH, "a", encoding="utf-8")
+            _file.write(line)
+            _file.flush()
+
+@contextmanager
+def collect_spans(spans=None):
+    # Spans finished inside this block (including in threads that copied the
+    # context, like LangGraph's parallel nodes) are appended to the list.
+    spans = [] if spans is None else spans
+    token = _collector.set(spans)
+    try:
+        yield spans
+    finally:
+        _collector.reset(token)
+
+def spans_table(spans):
+    # Rows for display in tree order (children under their parent, siblings by
+    # start time) with the name indented by depth.
+    ids = {s["span_id"] for s in spans}
+    children = {}
+    for s in sorted(spans, key=lambda s: s["start_time_unix_nano"]):
+        parent = s["parent_span_id"] if s["parent_span_id"] in ids else None
+        children.setdefault(parent, []).append(s)
+
+    rows = []
+
+    def visit(parent, depth):
+        for s in children.get(parent, []):
+            rows.append({
+                "Stage": "  " * depth + s["name"],
+                "Duration (ms)": round(s["duration_ms"], 1),
+                "Status": s["status"],
+                "Details": ", ".join(f"{k}={v}" for k, v in s["attributes"].items()),
+            })
+            visit(s["span_id"], depth + 1)
+
+    visit(None, 0)
+    return rows
+
+def summarize_spans(spans):
+    # Wall-clock time covered by the root spans, time per stage name (nested
+    # spans counted under their own name), and LLM throughput from Ollama's
+    # eval counters over uncached calls.
+    if not spans:
+        return {"wall_ms": 0.0, "stages": {}, "llm_calls": 0, "tokens_per_s": None}
+    ids = {s["span_id"] for s in spans}
+    roots = [s for s in spans if s["parent_span_id"] not in ids]
+    wall_ns = max(s["end_time_unix_nano"] for s in roots) - min(s["start_time_unix_nano"] for s in roots)
+
+    stages = {}
+    for s in spans:
+        stages[s["name"]] = stages.get(s["name"], 0.0) + s["duration_ms"]
+
+    llm = [s["attributes"] for s in spans if s["name"].startswith("llm.") and not s["attributes"].get("cached")]
+    eval_count = sum(a.get("eval_count", 0) for a in llm)
+    eval_ms = sum(a.get("eval_ms", 0) for a in llm)
+    return {
+        "wall_ms": wall_ns / 1e6,
+        "stages": stages,
+        "llm_calls": len(llm),
+        "tokens_per_s": eval_count / (eval_ms / 1000) if eval_ms else None,
+    }
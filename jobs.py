@@ -0,0 +1,161 @@
+# jobs.py
+# Background jobs for dashboard analyses. Jobs run on a shared thread pool so
+# the Streamlit script only submits and polls; the job table keeps status,
+# progress, streamed output and results, and identical in-flight requests
+# (same kind, data version and parameters) are coalesced into a single job.
+
+import itertools
+import logging
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from agent_flow import ANALYSIS_NODES, run_pipeline, scenario_params
+from data_source import data_version
+from instrumentation import collect_spans
+from load_contracts import corpus_version, stream_procurement_summary
+from result_cache import input_versions, lookup, store
+from sku_rationalization import stream_sku_summary
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_RETENTION_S = float(os.environ.get("JOB_RETENTION_S", "3600"))  # finished jobs stay pollable this long
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+logger = logging.getLogger(__name__)
+
+class JobRunner:
+    def __init__(self, max_workers=JOB_WORKERS, retention_s=JOB_RETENTION_S):
+        self.retention_s = retention_s
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+        self._lock = threading.Lock()
+        self._jobs = {}        # job id -> job record
+        self._in_flight = {}   # request key -> job id, while queued or running
+        self._ids = itertools.count(1)
+
+    def submit(self, kind, fn, version, **params) -> str:
+        # Runs fn(progress, **params) in the background and returns its job id.
+        # progress(fraction, message, output) updates the job; output text is
+        # appended to what pollers see while the job runs.
+        # A request whose (kind, version, params) matches a queued or running
+        # job joins that job instead of starting another.
+        key = (kind, version, tuple(sorted(params.items())))
+        with self._lock:
+            self._expire()
+            job_id = self._in_flight.get(key)
+            if job_id is not None:
+                self._jobs[job_id]["requests"] += 1
+                return job_id
+            job_id = f"{kind}-{next(self._ids)}"
+            self._jobs[job_id] = {
+                "id": job_id, "kind": kind, "params": params, "version": version,
+                "status": QUEUED, "progress": 0.0, "message": "Queued", "requests": 1,
+                "result": None, "error": None, "traceback": None, "spans": [], "output": [],
+                "submitted_at": time.time(), "started_at": None, "finished_at": None,
+            }
+            self._in_flight[key] = job_id
+        self._executor.submit(self._run, job_id, key, fn, params)
+        return job_id
+
+    def _run(self, job_id, key, fn, params):
+        self._update(job_id, status=RUNNING, message="Running", started_at=time.time())
+
+        def progress(fraction=None, message=None, output=None):
+            with self._lock:
+                job = self._jobs[job_id]
+                if fraction is not None:
+                    job["progress"] = min(max(fraction, 0.0), 1.0)
+                if message:
+                    job["message"] = message
+                if output:
+                    job["output"].append(output)
+
+        try:
+            with collect_spans(self._jobs[job_id]["spans"]):
+                result = fn(progress, **params)
+            outcome = {"status": DONE, "result": result, "progress": 1.0, "message": "Complete"}
+        except Exception as e:
+            logger.exception("Job %s failed", job_id)
+            outcome = {"status": FAILED, "error": str(e), "traceback": traceback.format_exc(), "message": "Failed"}
+        with self._lock:
+            self._in_flight.pop(key, None)
+            self._jobs[job_id].update(outcome, finished_at=time.time())
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _expire(self):
+        cutoff = time.time() - self.retention_s
+        for job_id, job in list(self._jobs.items()):
+            if job["finished_at"] is not None and job["finished_at"] < cutoff:
+                del self._jobs[job_id]
+
+    def get(self, job_id):
+        # Snapshot of one job, or None once it has expired.
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job, spans=list(job["spans"]), output="".join(job["output"])) if job else None
+
+    def jobs(self):
+        with self._lock:
+            return [dict(job, spans=None, output=None) for job in self._jobs.values()]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+# === Process-wide default runner ===
+_default_runner = None
+_default_lock = threading.Lock()
+
+def get_runner() -> JobRunner:
+    global _default_runner
+    with _default_lock:
+        if _default_runner is None:
+            _default_runner = JobRunner()
+    return _default_runner
+
+# === Analysis jobs ===
+def _pipeline_job(progress, demand_change):
+    completed = []
+
+    def on_node_complete(node_name, _state):
+        completed.append(node_name)
+        progress(len(completed) / (len(ANALYSIS_NODES) + 1), f"Completed: {', '.join(completed)}")
+
+    return run_pipeline(on_node_complete, demand_change=demand_change)
+
+def submit_pipeline(demand_change) -> str:
+    # Keyed on the CSV and contract corpus contents, so a data change starts a
+    # fresh job even while an older one is still running, and on the normalized
+    # parameters, so -15 and -15.0 share one job.
+    return get_runner().submit("pipeline", _pipeline_job, (data_version(), corpus_version()),
+                               **scenario_params(demand_change))
+
+# Token streams per summary, for the dashboard's streamed mode
+SUMMARY_STREAMS = {
+    "sku_summary": stream_sku_summary,
+    "procurement_summary": stream_procurement_summary,
+}
+
+def _summary_job(progress, analysis):
+    # Streams one summary into the job's output; a summary another session
+    # already produced for the same inputs is returned as-is.
+    key, versions, text = lookup(analysis)
+    if text is None:
+        progress(message="Streaming")
+        pieces = []
+        for token in SUMMARY_STREAMS[analysis]():
+            pieces.append(token)
+            progress(output=token)
+        text = "".join(pieces)
+        store(key, analysis, versions, text)
+    return text
+
+def submit_summary(analysis) -> str:
+    # Keyed on the inputs this summary reads, so sessions streaming the same
+    # summary over the same data share one job.
+    return get_runner().submit(analysis, _summary_job, tuple(sorted(input_versions(analysis).items())),
+                               analysis=analysis)
@@ -0,0 +1,230 @@
+# llm_client.py
+# Shared Ollama client: pooled keep-alive connections, bounded concurrency,
+# timeouts, retry with backoff, and an asyncio interface. Every module that
+# talks to the LLM goes through here so throughput is tuned in one place.
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import elapsed_ms, end_span, span, start_span
+from llm_cache import cache_key, get_cache
+
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+LLM_MODEL = os.environ.get("LLM_MODEL", "tinyllama")
+LLM_KEEP_ALIVE = os.environ.get("LLM_KEEP_ALIVE", "30m")  # keeps the model loaded between calls
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "4"))
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", "300"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_SECONDS = float(os.environ.get("LLM_BACKOFF_SECONDS", "0.5"))
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE", "1") != "0"
+
+# Connection failures and these statuses are retried. A read timeout is not:
+# the server accepted the request and is still busy (or hung), and retrying
+# would hold the caller for (retries + 1) x LLM_READ_TIMEOUT.
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class LLMError(RuntimeError):
+    pass
+
+def generation_metrics(result) -> dict:
+    # Ollama reports durations in nanoseconds; tokens/s is eval_count over eval_duration.
+    metrics = {}
+    for key in ("prompt_eval_count", "eval_count"):
+        if key in result:
+            metrics[key] = result[key]
+    for key in ("load_duration", "prompt_eval_duration", "eval_duration", "total_duration"):
+        if result.get(key):
+            metrics[key.replace("duration", "ms")] = round(result[key] / 1e6, 1)
+    if result.get("eval_count") and result.get("eval_duration"):
+        metrics["tokens_per_s"] = round(result["eval_count"] / (result["eval_duration"] / 1e9), 1)
+    return metrics
+
+class LLMClient:
+    def __init__(self, base_url=OLLAMA_URL, model=LLM_MODEL, keep_alive=LLM_KEEP_ALIVE,
+                 max_concurrency=LLM_MAX_CONCURRENCY, timeout=(LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT),
+                 max_retries=LLM_MAX_RETRIES, backoff=LLM_BACKOFF_SECONDS, cache=None):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.cache = cache  # LLMResponseCache or None
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def _payload(self, prompt, model, options, stream):
+        payload = {
+            "model": model or self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+        }
+        if options:
+            payload["options"] = options
+        return payload
+
+    def _sleep_before_retry(self, attempt):
+        time.sleep(self.backoff * (2 ** attempt) * (1 + random.random() * 0.1))
+
+    def generate_raw(self, prompt, model=None, options=None, use_cache=True) -> dict:
+        # Full Ollama /api/generate response (text plus eval counters).
+        payload = self._payload(prompt, model, options, stream=False)
+        with span("llm.generate", model=payload["model"], prompt_chars=len(prompt)) as s:
+            key = None
+            if self.cache is not None and use_cache:
+                key = cache_key(payload["model"], prompt, options)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    s["attributes"]["cached"] = True
+                    return {**cached, "cached": True}
+            result = self._request(payload)
+            s["attributes"].update(cached=False, **generation_metrics(result))
+            if key is not None:
+                # "context" is the token state for follow-up calls; not worth storing
+                self.cache.put(key, payload["model"], {k: v for k, v in result.items() if k != "context"})
+            return result
+
+    def _request(self, payload) -> dict:
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._sleep_before_retry(attempt - 1)
+            try:
+                with self._slots:
+                    response = self._session.post(
+                        f"{self.base_url}/api/generate", json=payload, timeout=self.timeout
+                    )
+            except requests.ReadTimeout as e:
+                raise LLMError(f"LLM request timed out after {self.timeout[1]}s without a response") from e
+            except requests.ConnectionError as e:  # includes connect timeouts
+                last_error = e
+                continue
+            if response.status_code in RETRY_STATUS_CODES:
+                last_error = LLMError(f"Ollama returned HTTP {response.status_code}")
+                continue
+            if response.status_code != 200:
+                raise LLMError(f"Ollama returned HTTP {response.status_code}: {response.text[:200]}")
+            return response.json()
+        raise LLMError(f"LLM request failed after {self.max_retries + 1} attempts: {last_error}")
+
+    def generate(self, prompt, model=None, options=None, use_cache=True) -> str:
+        return self.generate_raw(prompt, model, options, use_cache).get("response", "").strip()
+
+    def stream(self, prompt, model=None, options=None, use_cache=True):
+        # Yields response tokens as Ollama emits them. A cache hit is yielded as
+        # one piece; a completed stream is stored so the next call is a hit.
+        payload = self._payload(prompt, model, options, stream=True)
+        # Not a `with span(...)`: the generator suspends at each yield, and a
+        # context manager here would leak this span into the caller's context.
+        record = start_span("llm.stream", model=payload["model"], prompt_chars=len(prompt))
+        key = None
+        if self.cache is not None and use_cache:
+            key = cache_key(payload["model"], prompt, options)
+            cached = self.cache.get(key)
+            if cached is not None:
+                record["attributes"]["cached"] = True
+                end_span(record)
+                yield cached.get("response", "")
+                return
+
+        record["attributes"]["cached"] = False
+        error = None
+        try:
+            with self._slots:
+                response = self._open_stream(payload)
+                pieces = []
+                final = {}
+                with response:
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        event = json.loads(line)
+                        if event.get("error"):
+                            raise LLMError(f"Ollama stream error: {event['error']}")
+                        token = event.get("response", "")
+                        if token:
+                            if not pieces:
+                                record["attributes"]["time_to_first_token_ms"] = elapsed_ms(record)
+                            pieces.append(token)
+                            yield token
+                        if event.get("done"):
+                            final = event
+                            break
+            record["attributes"].update(generation_metrics(final))
+        except BaseException as e:
+            # GeneratorExit (consumer stopped early) is not a failure of the call
+            error = None if isinstance(e, GeneratorExit) else e
+            raise
+        finally:
+            end_span(record, error)
+
+        if key is not None and final:
+            result = {k: v for k, v in final.items() if k != "context"}
+            result["response"] = "".join(pieces)
+            self.cache.put(key, payload["model"], result)
+
+    def _open_stream(self, payload):
+        # Retries only cover establishing the stream; once tokens flow they are
+        # already on screen, so a mid-stream failure is raised to the caller.
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._sleep_before_retry(attempt - 1)
+            try:
+                response = self._session.post(
+                    f"{self.base_url}/api/generate", json=payload, timeout=self.timeout, stream=True
+                )
+            except requests.ReadTimeout as e:
+                raise LLMError(f"LLM stream timed out after {self.timeout[1]}s without a response") from e
+            except requests.ConnectionError as e:  # includes connect timeouts
+                last_error = e
+                continue
+            if response.status_code == 200:
+                return response
+            response.close()
+            if response.status_code not in RETRY_STATUS_CODES:
+                raise LLMError(f"Ollama returned HTTP {response.status_code}")
+            last_error = LLMError(f"Ollama returned HTTP {response.status_code}")
+        raise LLMError(f"LLM stream failed after {self.max_retries + 1} attempts: {last_error}")
+
+    async def agenerate(self, prompt, model=None, options=None, use_cache=True) -> str:
+        # Runs on a worker thread; the shared semaphore still bounds in-flight requests.
+        return await asyncio.to_thread(self.generate, prompt, model, options, use_cache)
+
+    async def agenerate_many(self, prompts, model=None, options=None) -> list:
+        return await asyncio.gather(*(self.agenerate(p, model, options) for p in prompts))
+
+    def close(self):
+        self._session.close()
+
+# === Process-wide default client ===
+_default_client = None
+_default_lock = threading.Lock()
+
+def get_client() -> LLMClient:
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = LLMClient(cache=get_cache() if LLM_CACHE_ENABLED else None)
+    return _default_client
+
+def generate(prompt, model=None, options=None, use_cache=True) -> str:
+    return get_client().generate(prompt, model, options, use_cache)
+
+def stream_generate(prompt, model=None, options=None, use_cache=True):
+    yield from get_client().stream(prompt, model, options, use_cache)
+
+async def agenerate(prompt, model=None, options=None, use_cache=True) -> str:
+    return await get_client().agenerate(prompt, model, options, use_cache)
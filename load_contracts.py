@@ -132,46 +132,431 @@
 
 # load_contracts.py
 
-import requests
-from llama_index.core import SimpleDirectoryReader
-from llama_index.core.node_parser import SentenceSplitter
-from sentence_transformers import SentenceTransformer
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
 import faiss
 import numpy as np
 
-def get_procurement_summary() -> str:
-    # Step 1: Load and chunk documents
-    documents = SimpleDirectoryReader("./contracts").load_data()
-    splitter = SentenceSplitter(chunk_size=1024, chunk_overlap=100)
-    nodes = splitter.get_nodes_from_documents(documents)
-    texts = [node.text for node in nodes]
-
-    # Step 2: Generate embeddings and FAISS index
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    embeddings = model.encode(texts)
-    dimension = embeddings[0].shape[0]
-    index = faiss.IndexFlatL2(dimension)
-    index.add(np.array(embeddings))
-    text_id_map = {i: text for i, text in enumerate(texts)}
-
-    # Step 3: Generate LLM Summary
-    context = "\n\n".join(text_id_map.values())[:3000]  # truncate context
-    prompt = f"""
+from contract_parsing import chunk_contract
+from data_source import data_version
+from embeddings import ENCODE_BATCH_SIZE, encode
+from instrumentation import end_span, set_attributes, span, start_span, traced
+from llm_client import generate, stream_generate
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+CONTRACTS_DIR = "./contracts"
+INDEX_DIR = os.environ.get("CONTRACT_INDEX_DIR", "./.cache/contract_index")
+INDEX_FILE = os.path.join(INDEX_DIR, "contracts.faiss")
+MANIFEST_FILE = os.path.join(INDEX_DIR, "manifest.json")
+EMBEDDINGS_DIR = os.path.join(INDEX_DIR, "embeddings")
+SYNC_LOCK_FILE = os.path.join(INDEX_DIR, "sync.lock")
+INGEST_WORKERS = int(os.environ.get("CONTRACT_INGEST_WORKERS", "0")) or (os.cpu_count() or 1)
+
+logger = logging.getLogger(__name__)
+
+# === Contract files and content hashes ===
+def list_contracts(contracts_dir=CONTRACTS_DIR):
+    return sorted(
+        os.path.join(contracts_dir, name)
+        for name in os.listdir(contracts_dir)
+        if name.lower().endswith(".pdf")
+    )
+
+def corpus_version(contracts_dir=CONTRACTS_DIR):
+    # One hash for the whole contract set (names and contents); files are only
+    # re-hashed when their mtime/size change.
+    digest = hashlib.sha256()
+    for path in list_contracts(contracts_dir):
+        digest.update(f"{os.path.basename(path)}\0{data_version(path)}\n".encode())
+    return digest.hexdigest()
+
+def _read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _tmp_path(path):
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+def _write_json(path, data):
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+# === Parallel parsing/chunking and batched embedding ===
+def _iter_parsed_contracts(paths, workers):
+    if not paths:
+        return
+    if workers <= 1 or len(paths) == 1:
+        for path in paths:
+            yield path, chunk_contract(path)
+        return
+    # spawn: the parent may already hold torch/FAISS threads, which fork doesn't survive.
+    # Worker spans only reach the trace file; this one covers the pool as a whole.
+    record = start_span("pdf.parse_pool", files=len(paths), workers=min(workers, len(paths)))
+    context = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths)), mp_context=context) as pool:
+            futures = {pool.submit(chunk_contract, path): path for path in paths}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+    finally:
+        end_span(record)
+
+def iter_embedded_contracts(paths, workers=INGEST_WORKERS, batch_size=ENCODE_BATCH_SIZE):
+    # PDFs are parsed and chunked concurrently; chunks are queued as each PDF
+    # finishes and embedded in full batches, so encoding overlaps parsing.
+    # Yields (path, texts, embeddings) once every chunk of a contract is embedded.
+    pending = {}
+    buffer = []
+
+    def flush():
+        vectors = encode([text for _, _, text in buffer], batch_size=batch_size)
+        finished = []
+        for (path, i, _), vector in zip(buffer, vectors):
+            entry = pending[path]
+            entry["vectors"][i] = vector
+            entry["remaining"] -= 1
+            if entry["remaining"] == 0:
+                finished.append(path)
+        buffer.clear()
+        for path in finished:
+            entry = pending.pop(path)
+            yield path, entry["texts"], np.vstack(entry["vectors"])
+
+    for path, texts in _iter_parsed_contracts(paths, workers):
+        logger.info("Parsed %s (%d chunks)", os.path.basename(path), len(texts))
+        if not texts:
+            yield path, texts, None
+            continue
+        pending[path] = {"texts": texts, "vectors": [None] * len(texts), "remaining": len(texts)}
+        buffer.extend((path, i, text) for i, text in enumerate(texts))
+        if len(buffer) >= batch_size:
+            yield from flush()
+
+    if buffer:
+        yield from flush()
+
+def _store_contract(content_hash, texts, embeddings):
+    if embeddings is not None:
+        np.save(os.path.join(EMBEDDINGS_DIR, f"{content_hash}.npy"), embeddings)
+    _write_json(os.path.join(EMBEDDINGS_DIR, f"{content_hash}.json"), texts)
+
+def _prune_embeddings(manifest):
+    # Drops stored chunks/embeddings of contents no document references any more.
+    live = {doc["hash"] for doc in manifest["documents"].values()}
+    removed = 0
+    for name in os.listdir(EMBEDDINGS_DIR):
+        content_hash, ext = os.path.splitext(name)
+        if ext in (".json", ".npy") and content_hash not in live:
+            os.remove(os.path.join(EMBEDDINGS_DIR, name))
+            removed += 1
+    return removed
+
+def _load_cached_contract(content_hash):
+    npy_path = os.path.join(EMBEDDINGS_DIR, f"{content_hash}.npy")
+    texts_path = os.path.join(EMBEDDINGS_DIR, f"{content_hash}.json")
+    if not os.path.exists(texts_path):
+        return None
+    texts = _read_json(texts_path, [])
+    if not texts:
+        return texts, None
+    if not os.path.exists(npy_path):
+        return None
+    return texts, np.load(npy_path, mmap_mode="r")
+
+# === Persistent, ID-mapped FAISS index ===
+# Vector ids encode the owning contract: doc_id * CHUNK_ID_STRIDE + chunk number,
+# so all chunks of one contract can be removed with a single id range.
+CHUNK_ID_STRIDE = 1 << 20
+MANIFEST_VERSION = 2
+
+def _empty_manifest():
+    return {"version": MANIFEST_VERSION, "next_doc_id": 0, "documents": {}}
+
+def _load_manifest():
+    manifest = _read_json(MANIFEST_FILE, None)
+    if not manifest or manifest.get("version") != MANIFEST_VERSION or not os.path.exists(INDEX_FILE):
+        return _empty_manifest()
+    return manifest
+
+def detect_changes(manifest, contracts_dir=CONTRACTS_DIR):
+    # Content hashes are memoized per file signature (as in corpus_version), so
+    # a sync with no changes only stats the PDFs.
+    current = {os.path.basename(p): data_version(p) for p in list_contracts(contracts_dir)}
+    known = manifest["documents"]
+    return {
+        "added": sorted(name for name in current if name not in known),
+        "modified": sorted(
+            name for name in current if name in known and known[name]["hash"] != current[name]
+        ),
+        "deleted": sorted(name for name in known if name not in current),
+        "hashes": current,
+    }
+
+def _doc_id_range(doc_id):
+    return doc_id * CHUNK_ID_STRIDE, (doc_id + 1) * CHUNK_ID_STRIDE
+
+def _chunk_ids(doc_id, count):
+    return np.arange(count, dtype="int64") + doc_id * CHUNK_ID_STRIDE
+
+def _add_contract(index, manifest, name, content_hash, texts, embeddings):
+    documents = manifest["documents"]
+    if len(texts) >= CHUNK_ID_STRIDE:
+        raise ValueError(f"{name} has {len(texts)} chunks; at most {CHUNK_ID_STRIDE - 1} are supported")
+
+    if name in documents:
+        doc_id = documents[name]["doc_id"]
+    else:
+        doc_id = manifest["next_doc_id"]
+        manifest["next_doc_id"] += 1
+    documents[name] = {"hash": content_hash, "doc_id": doc_id, "chunks": len(texts)}
+
+    if texts:
+        embeddings = np.asarray(embeddings, dtype="float32")
+        if index is None:
+            index = faiss.IndexIDMap2(faiss.IndexFlatL2(embeddings.shape[1]))
+        with span("faiss.add", file=name, vectors=len(texts)):
+            index.add_with_ids(embeddings, _chunk_ids(doc_id, len(texts)))
+    return index
+
+# === Sync serialization ===
+# One sync at a time: a thread lock within the process, a file lock across
+# processes (dashboard workers, CLI runs). Readers may hold the index mmapped,
+# so it is never rewritten in place, only replaced.
+_sync_lock = threading.Lock()
+
+@contextmanager
+def _file_lock(path):
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after ~10s; keep waiting
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+@traced("contracts.sync")
+def sync_contracts(contracts_dir=CONTRACTS_DIR, workers=INGEST_WORKERS):
+    # Applies added/modified/deleted PDFs to the stored index.
+    # Returns (index, manifest, changes).
+    os.makedirs(EMBEDDINGS_DIR, exist_ok=True)
+    with _sync_lock, _file_lock(SYNC_LOCK_FILE):
+        return _sync_locked(contracts_dir, workers)
+
+def _sync_locked(contracts_dir, workers):
+    manifest = _load_manifest()
+    changes = detect_changes(manifest, contracts_dir)
+    dirty = changes["added"] or changes["modified"] or changes["deleted"]
+    set_attributes(**{kind: len(changes[kind]) for kind in ("added", "modified", "deleted")})
+
+    if not dirty and manifest["documents"]:
+        with span("faiss.load", mmap=True):
+            index = faiss.read_index(INDEX_FILE, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        return index, manifest, changes
+
+    index = None
+    if manifest["documents"]:
+        with span("faiss.load", mmap=False):
+            index = faiss.read_index(INDEX_FILE)
+    documents = manifest["documents"]
+
+    for name in changes["deleted"] + changes["modified"]:
+        lo, hi = _doc_id_range(documents[name]["doc_id"])
+        with span("faiss.remove", file=name):
+            index.remove_ids(faiss.IDSelectorRange(lo, hi))
+        if name in changes["deleted"]:
+            del documents[name]
+
+    to_embed = {}
+    for name in changes["added"] + changes["modified"]:
+        content_hash = changes["hashes"][name]
+        cached = _load_cached_contract(content_hash)
+        if cached is None:
+            to_embed[os.path.join(contracts_dir, name)] = content_hash
+        else:
+            index = _add_contract(index, manifest, name, content_hash, *cached)
+
+    for path, texts, embeddings in iter_embedded_contracts(list(to_embed), workers):
+        _store_contract(to_embed[path], texts, embeddings)
+        index = _add_contract(index, manifest, os.path.basename(path), to_embed[path], texts, embeddings)
+
+    if not documents:
+        raise FileNotFoundError(f"No contract PDFs found in {contracts_dir}")
+    if index is None:
+        raise ValueError(f"No text could be extracted from the PDFs in {contracts_dir}")
+
+    with span("faiss.write", vectors=index.ntotal):
+        tmp_index = _tmp_path(INDEX_FILE)
+        faiss.write_index(index, tmp_index)
+        os.replace(tmp_index, INDEX_FILE)
+        _write_json(MANIFEST_FILE, manifest)
+    set_attributes(pruned=_prune_embeddings(manifest))
+    return index, manifest, changes
+
+def load_chunks(manifest):
+    # Maps vector id -> chunk text/metadata, read from the per-contract stores.
+    chunks = {}
+    for name, doc in manifest["documents"].items():
+        texts = _read_json(os.path.join(EMBEDDINGS_DIR, f"{doc['hash']}.json"), [])
+        for i, vector_id in enumerate(_chunk_ids(doc["doc_id"], len(texts))):
+            chunks[int(vector_id)] = {"file": name, "hash": doc["hash"], "chunk": i, "text": texts[i]}
+    return chunks
+
+def load_index(contracts_dir=CONTRACTS_DIR):
+    index, manifest, _ = sync_contracts(contracts_dir)
+    return index, load_chunks(manifest)
+
+# === Retrieval over the contract index ===
+ANALYSIS_QUERIES = {
+    "Termination": "Under what conditions can the agreement be terminated?",
+    "Liability": "What limitations of liability or caps on damages apply?",
+    "Payment Terms": "What are the payment terms, invoicing schedule and late payment conditions?",
+    "Service Levels": "What service levels, delivery obligations or performance standards must be met?",
+    "Indemnity": "What indemnification obligations does each party have?",
+}
+RETRIEVAL_TOP_K = 2        # chunks per question per contract
+MAX_CONTEXT_CHARS = 3000   # same token budget as the old truncated context
+MIN_EXCERPT_CHARS = 200    # excerpts are never cut shorter than this
+SEARCH_OVERSAMPLE = 4      # global hits fetched per contract and top_k slot
+PROCUREMENT_MODE = "retrieval"  # or "truncate": the first MAX_CONTEXT_CHARS of every chunk
+
+def _nearest_per_contract(index, chunks, query_embeddings, top_k):
+    # [{doc_id: [(distance, vector id), nearest first]}] per query. One search over the
+    # whole index, with hits grouped by contract; a contract left with fewer
+    # than top_k hits (crowded out by closer contracts) has its own vectors
+    # scored directly, so each contract still gets its true top_k.
+    doc_chunks = {}
+    for vector_id in sorted(chunks):
+        doc_chunks.setdefault(vector_id // CHUNK_ID_STRIDE, []).append(vector_id)
+    k = min(index.ntotal, top_k * len(doc_chunks) * SEARCH_OVERSAMPLE)
+    distances, ids = index.search(query_embeddings, k)
+
+    vectors = {}  # doc_id -> reconstructed vectors, shared across queries
+    nearest = []
+    for q, query in enumerate(query_embeddings):
+        by_doc = {}
+        for dist, vector_id in zip(distances[q], ids[q]):
+            if vector_id >= 0 and int(vector_id) in chunks:
+                hits = by_doc.setdefault(int(vector_id) // CHUNK_ID_STRIDE, [])
+                if len(hits) < top_k:
+                    hits.append((float(dist), int(vector_id)))
+        for doc_id, doc_ids in doc_chunks.items():
+            if len(by_doc.get(doc_id, [])) < min(top_k, len(doc_ids)):
+                if doc_id not in vectors:
+                    vectors[doc_id] = index.reconstruct_batch(np.asarray(doc_ids, dtype="int64"))
+                doc_distances = ((vectors[doc_id] - query) ** 2).sum(axis=1)
+                by_doc[doc_id] = [(float(doc_distances[i]), doc_ids[i])
+                                  for i in np.argsort(doc_distances, kind="stable")[:top_k]]
+        nearest.append(by_doc)
+    return nearest
+
+@traced("contracts.retrieve")
+def retrieve_contract_context(index, chunks, queries=ANALYSIS_QUERIES,
+                              top_k=RETRIEVAL_TOP_K, max_chars=MAX_CONTEXT_CHARS):
+    # Every contract contributes its top_k chunks per question, even when
+    # another contract has many closer ones. Hits are interleaved round-robin
+    # (each contract's best chunk before anyone's second best) and each
+    # excerpt gets an equal share of the per-question budget (at least
+    # MIN_EXCERPT_CHARS), so one long chunk can't use up the whole budget.
+    query_embeddings = np.asarray(encode(queries.values()), dtype="float32")
+    nearest = _nearest_per_contract(index, chunks, query_embeddings, top_k)
+    n_docs = len({vector_id // CHUNK_ID_STRIDE for vector_id in chunks})
+
+    budget = max_chars // len(queries)
+    excerpt_chars = max(budget // max(n_docs * top_k, 1), MIN_EXCERPT_CHARS)
+    set_attributes(contracts=n_docs, excerpt_chars=excerpt_chars)
+    sections = {}
+    for q, topic in enumerate(queries):
+        hits = sorted(
+            (rank, dist, vector_id)
+            for doc_hits in nearest[q].values()
+            for rank, (dist, vector_id) in enumerate(doc_hits)
+        )
+        remaining = budget
+        excerpts = []
+        for _, _, vector_id in hits:
+            chunk = chunks[vector_id]
+            label = f"[{chunk['file']}] "
+            if remaining <= len(label):
+                break
+            excerpt = label + chunk["text"][:max(min(excerpt_chars, remaining) - len(label), 0)]
+            excerpts.append(excerpt)
+            remaining -= len(excerpt)
+        sections[topic] = excerpts
+    return sections
+
+def build_retrieval_prompt(sections):
+    context = "\n\n".join(
+        f"### {topic}\n" + "\n".join(excerpts) for topic, excerpts in sections.items()
+    )
+    return f"""
+You are a supply chain legal assistant. Based on the following excerpts retrieved from procurement contracts, summarize the key terms, risks, and decision points for each topic.
+
+📄 Context:
+{context}
+
+🎯 Summary:"""
+
+def build_procurement_prompt(mode: str = PROCUREMENT_MODE) -> str:
+    # Step 1 + 2: Sync the persisted FAISS index with ./contracts
+    index, chunks = load_index()
+
+    # Step 3: Build the LLM context
+    with span("prompt.build", analysis="procurement", mode=mode) as s:
+        if mode == "retrieval":
+            prompt = build_retrieval_prompt(retrieve_contract_context(index, chunks))
+        elif mode == "truncate":
+            text_id_map = {vector_id: chunk["text"] for vector_id, chunk in sorted(chunks.items())}
+            context = "\n\n".join(text_id_map.values())[:MAX_CONTEXT_CHARS]  # truncate context
+            prompt = f"""
 You are a supply chain legal assistant. Based on the following context from procurement contracts, summarize key terms, risks, and decision points.
 
 📄 Context:
 {context}
 
 🎯 Summary:"""
+        else:
+            raise ValueError(f"Unknown procurement summary mode: {mode!r}")
+        s["attributes"]["chars"] = len(prompt)
+    return prompt
 
-    response = requests.post(
-        "http://localhost:11434/api/generate",
-        json={"model": "tinyllama", "prompt": prompt, "stream": False}
-    )
-    return response.json().get("response", "").strip()
+def get_procurement_summary(mode: str = PROCUREMENT_MODE) -> str:
+    # Step 4: Generate LLM Summary
+    return generate(build_procurement_prompt(mode))
+
+# Token-by-token variant for the dashboard
+def stream_procurement_summary(mode: str = PROCUREMENT_MODE):
+    yield from stream_generate(build_procurement_prompt(mode))
 
 # Optional: Keep this for manual test runs
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     summary = get_procurement_summary()
     print("\n📋 Procurement Summary:\n", summary)
-
@@ -0,0 +1,194 @@
+# result_cache.py
+# Cross-session cache of finished analysis summaries, persisted in SQLite so
+# every dashboard session (and a restarted server) reuses them. Each entry is
+# keyed on the inputs its analysis depends on: the contracts corpus hash, the
+# CSV hash, the scenario parameters, the model name and the prompt version and
+# settings. Entries built from a CSV or contract set that has since changed
+# are deleted when the change is first seen; entries for other models are kept.
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from data_source import data_version
+from instrumentation import span
+from llm_client import LLM_MODEL
+from load_contracts import ANALYSIS_QUERIES, MAX_CONTEXT_CHARS, PROCUREMENT_MODE, RETRIEVAL_TOP_K, corpus_version
+from sku_rationalization import PROMPT_COLUMNS, PROMPT_TOP_K, SKU_RANKING, SKU_RULES
+
+RESULT_CACHE_PATH = os.environ.get("RESULT_CACHE_PATH", "./.cache/results.sqlite")
+RESULT_CACHE_ENABLED = os.environ.get("RESULT_CACHE", "1") != "0"
+RESULT_CACHE_ADMIN = os.environ.get("RESULT_CACHE_ADMIN", "0") == "1"  # shows the dashboard's clear button
+
+# Bump when a prompt template's wording changes, so summaries written for the
+# old wording are not served for the new one.
+PROMPT_VERSION = 1
+
+# Which inputs each analysis reads; the others are left out of its key so,
+# e.g., a new contract does not throw away the SKU summary.
+ANALYSIS_INPUTS = {
+    "procurement_summary": ("contracts",),
+    "scenario_summary": ("csv",),
+    "sku_summary": ("csv",),
+}
+
+VERSION_COLUMNS = {"csv": "csv_version", "contracts": "corpus_version", "model": "model"}
+
+def input_versions(analysis) -> dict:
+    # Only the inputs this analysis reads are hashed. Content hashes are
+    # memoized per file signature, so this is cheap while nothing changes.
+    inputs = ANALYSIS_INPUTS[analysis]
+    versions = {"model": LLM_MODEL}
+    if "csv" in inputs:
+        versions["csv"] = data_version()
+    if "contracts" in inputs:
+        versions["contracts"] = corpus_version()
+    return versions
+
+def prompt_settings(analysis) -> dict:
+    # Settings that shape an analysis's prompt, and so its summary.
+    if analysis == "procurement_summary":
+        return {"mode": PROCUREMENT_MODE, "top_k": RETRIEVAL_TOP_K, "max_context_chars": MAX_CONTEXT_CHARS,
+                "queries": ANALYSIS_QUERIES}
+    if analysis == "sku_summary":
+        return {"top_k": PROMPT_TOP_K, "rules": SKU_RULES, "ranking": SKU_RANKING, "columns": PROMPT_COLUMNS}
+    return {}
+
+def result_key(analysis, versions, params=None) -> str:
+    material = {"analysis": analysis, "model": versions["model"], "params": params or {},
+                "prompt_version": PROMPT_VERSION, "prompt": prompt_settings(analysis)}
+    material.update({name: versions[name] for name in ANALYSIS_INPUTS[analysis]})
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()
+
+class ResultCache:
+    def __init__(self, path=RESULT_CACHE_PATH):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._seen = {}  # (model, input) -> version the model's entries were last checked against
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                   key TEXT PRIMARY KEY,
+                   analysis TEXT NOT NULL,
+                   csv_version TEXT,
+                   corpus_version TEXT,
+                   model TEXT NOT NULL,
+                   params TEXT NOT NULL,
+                   value TEXT NOT NULL,
+                   created_at REAL NOT NULL
+               )"""
+        )
+        self._conn.commit()
+
+    def invalidate_stale(self, versions) -> int:
+        # Drops entries of versions["model"] computed from a different CSV or
+        # contract set than `versions`; other models' entries are left alone
+        # (the model is part of the key). Only touches the database for inputs
+        # whose version differs from the last check.
+        model = versions["model"]
+        with self._lock:
+            changed = {
+                name: version for name, version in versions.items()
+                if name != "model" and self._seen.get((model, name)) != version
+            }
+            if not changed:
+                return 0
+            clauses = [
+                f"({VERSION_COLUMNS[name]} IS NOT NULL AND {VERSION_COLUMNS[name]} != ?)" for name in changed
+            ]
+            cursor = self._conn.execute(
+                f"DELETE FROM results WHERE model = ? AND ({' OR '.join(clauses)})", (model, *changed.values())
+            )
+            self._conn.commit()
+            self._seen.update({(model, name): version for name, version in changed.items()})
+            return cursor.rowcount
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, analysis, versions, value, params=None):
+        inputs = ANALYSIS_INPUTS[analysis]
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results "
+                "(key, analysis, csv_version, corpus_version, model, params, value, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, analysis,
+                 versions.get("csv") if "csv" in inputs else None,
+                 versions.get("contracts") if "contracts" in inputs else None,
+                 versions["model"], json.dumps(params or {}, sort_keys=True), json.dumps(value), time.time()),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+            self._seen = {}
+
+    def stats(self) -> dict:
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# === Process-wide default cache ===
+_default_cache = None
+_default_lock = threading.Lock()
+
+def get_result_cache() -> ResultCache:
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache()
+    return _default_cache
+
+# === Lookups used by the pipeline nodes and the dashboard ===
+def lookup(analysis, params=None, versions=None):
+    # (key, versions, cached value or None); key is None when caching is off.
+    if not RESULT_CACHE_ENABLED:
+        return None, None, None
+    versions = versions or input_versions(analysis)
+    cache = get_result_cache()
+    cache.invalidate_stale(versions)
+    key = result_key(analysis, versions, params)
+    with span("results.get", analysis=analysis) as s:
+        value = cache.get(key)
+        s["attributes"]["hit"] = value is not None
+    return key, versions, value
+
+def store(key, analysis, versions, value, params=None):
+    if key is not None and value:
+        get_result_cache().put(key, analysis, versions, value, params)
+
+def cached_result(analysis, compute, params=None):
+    # compute() runs only when no session has produced this result for the
+    # current inputs yet.
+    key, versions, value = lookup(analysis, params)
+    if value is None:
+        value = compute()
+        store(key, analysis, versions, value, params)
+    return value
@@ -0,0 +1,207 @@
+# risk_simulation.py
+# Monte Carlo risk engine for scenario planning. Each trial applies random
+# demand, lead time and shipping cost shocks to every SKU, the same three
+# levers as scenario_planning's simulate_* functions:
+#   revenue = sold * demand_factor * price          (simulate_demand_change)
+#   lead    = sampled lead time                     (simulate_lead_time_change)
+#   cost    = manufacturing * demand_factor
+#             + shipping * shipping_factor          (simulate_shipping_cost_increase)
+# Shock distributions are fitted to supply_chain_data.csv. Trials run in
+# fixed-size chunks (optionally across a process pool); SKU and supplier
+# quantiles come from per-entity histograms so memory doesn't grow with trials.
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_source import SUPPLY_CHAIN_CSV, load_supply_chain
+
+RISK_COLUMNS = ['SKU', 'Product type', 'Supplier name', 'Shipping carriers', 'Price',
+                'Number of products sold', 'Lead time', 'Shipping costs', 'Manufacturing costs']
+QUANTILES = (0.05, 0.50, 0.95)
+HISTOGRAM_BINS = 512
+PILOT_TRIALS = 2_000
+MAX_CELLS_PER_CHUNK = 2_000_000  # trials x SKUs held in memory at once
+RISK_WORKERS = int(os.environ.get("RISK_WORKERS", "1"))
+
+def load_risk_data(path=SUPPLY_CHAIN_CSV):
+    return load_supply_chain(RISK_COLUMNS, path=path)
+
+# === Distribution fitting ===
+def fit_distributions(df):
+    # Per-SKU parameter arrays, ordered by supplier so supplier totals are
+    # contiguous slices (np.add.reduceat) rather than a dense membership matrix.
+    df = df.sort_values('Supplier name', kind='stable').reset_index(drop=True)
+    sold = df['Number of products sold'].to_numpy(np.float64)
+    lead = df['Lead time'].to_numpy(np.float64)
+    shipping = df['Shipping costs'].to_numpy(np.float64)
+
+    # Demand: relative spread of units sold within each product type (CV)
+    by_type = df.groupby('Product type', observed=True)['Number of products sold']
+    demand_cv = (by_type.transform('std') / by_type.transform('mean')).fillna(0).to_numpy(np.float64)
+
+    # Lead time: gamma per supplier, method of moments (shape = mean²/var, scale = var/mean)
+    by_supplier = df.groupby('Supplier name', observed=True)['Lead time']
+    lead_mean = by_supplier.transform('mean').to_numpy(np.float64)
+    lead_var = by_supplier.transform('var').fillna(0).to_numpy(np.float64)
+    lead_var = np.where(lead_var > 0, lead_var, 1e-6)
+    lead_shape = lead_mean ** 2 / lead_var
+    lead_scale = lead_var / lead_mean
+
+    # Shipping cost: lognormal per carrier, used as a mean-one multiplier on each SKU's cost
+    log_shipping = np.log(np.clip(df['Shipping costs'].astype(np.float64), 1e-9, None))
+    shipping_sigma = log_shipping.groupby(df['Shipping carriers'], observed=True).transform('std')
+    shipping_sigma = shipping_sigma.fillna(0).to_numpy(np.float64)
+
+    suppliers, starts = np.unique(df['Supplier name'].astype(str).to_numpy(), return_index=True)
+    order = np.argsort(starts)
+    return {
+        'sku': df['SKU'].astype(str).to_numpy(),
+        'supplier_of_sku': df['Supplier name'].astype(str).to_numpy(),
+        'suppliers': suppliers[order],
+        'supplier_starts': starts[order],
+        'base_revenue': sold * df['Price'].to_numpy(np.float64),
+        'manufacturing': df['Manufacturing costs'].to_numpy(np.float64),
+        'shipping': shipping,
+        'base_lead': lead,
+        'demand_cv': demand_cv,
+        'lead_shape': lead_shape,
+        'lead_scale': lead_scale,
+        'shipping_sigma': shipping_sigma,
+    }
+
+# === Trial simulation ===
+def _simulate_trials(params, n_trials, rng):
+    n_skus = len(params['base_revenue'])
+    shape = (n_trials, n_skus)
+    demand_factor = np.maximum(1 + rng.standard_normal(shape) * params['demand_cv'], 0)
+    sigma = params['shipping_sigma']
+    shipping_factor = rng.lognormal(-sigma ** 2 / 2, sigma, shape)
+    lead = rng.gamma(params['lead_shape'], params['lead_scale'], shape)
+
+    revenue = demand_factor * params['base_revenue']
+    cost = demand_factor * params['manufacturing'] + shipping_factor * params['shipping']
+
+    starts = params['supplier_starts']
+    supplier_counts = np.diff(np.append(starts, n_skus))
+    return {
+        'sku': {'revenue': revenue, 'cost': cost, 'lead_time': lead},
+        'supplier': {
+            'revenue': np.add.reduceat(revenue, starts, axis=1),
+            'cost': np.add.reduceat(cost, starts, axis=1),
+            'lead_time': np.add.reduceat(lead, starts, axis=1) / supplier_counts,
+        },
+        'portfolio': {'revenue': revenue.sum(axis=1), 'cost': cost.sum(axis=1)},
+    }
+
+def _histogram(values, lo, hi, bins):
+    # One bincount for all entities: column j fills bins [j*bins, (j+1)*bins).
+    n_entities = values.shape[1]
+    width = np.where(hi > lo, hi - lo, 1.0)
+    idx = np.clip(((values - lo) / width * bins).astype(np.int64), 0, bins - 1)
+    idx += np.arange(n_entities) * bins
+    return np.bincount(idx.ravel(), minlength=n_entities * bins).reshape(n_entities, bins)
+
+def _histogram_edges(pilot):
+    # Pilot range padded by 25% each side; values beyond it land in the end
+    # bins, which only affects quantiles outside P5..P95.
+    edges = {}
+    for level in ('sku', 'supplier'):
+        for metric, values in pilot[level].items():
+            lo, hi = values.min(axis=0), values.max(axis=0)
+            pad = (hi - lo) * 0.25
+            edges[(level, metric)] = (lo - pad, hi + pad)
+    return edges
+
+def _run_chunk(params, n_trials, seed, edges, bins):
+    rng = np.random.default_rng(seed)
+    trials = _simulate_trials(params, n_trials, rng)
+    histograms = {
+        key: _histogram(trials[key[0]][key[1]], lo, hi, bins)
+        for key, (lo, hi) in edges.items()
+    }
+    return histograms, trials['portfolio']
+
+def _histogram_quantiles(counts, lo, hi, quantiles):
+    bins = counts.shape[1]
+    cumulative = np.cumsum(counts, axis=1)
+    total = cumulative[:, -1:]
+    width = (hi - lo) / bins
+    result = []
+    for q in quantiles:
+        target = q * total
+        b = np.argmax(cumulative >= target, axis=1)
+        rows = np.arange(len(b))
+        before = np.where(b > 0, cumulative[rows, np.maximum(b - 1, 0)], 0)
+        inside = counts[rows, b]
+        fraction = np.where(inside > 0, (target[:, 0] - before) / np.maximum(inside, 1), 0.5)
+        result.append(lo + (b + fraction) * width)
+    return result
+
+# === Public entry point ===
+def run_monte_carlo(df=None, n_trials=100_000, seed=None, workers=RISK_WORKERS,
+                    bins=HISTOGRAM_BINS):
+    # Returns {"sku": DataFrame, "supplier": DataFrame, "portfolio": dict}.
+    # Results depend only on seed and n_trials, not on the number of workers.
+    params = fit_distributions(load_risk_data() if df is None else df)
+    n_skus = len(params['base_revenue'])
+    root = np.random.SeedSequence(seed)
+    pilot_seed, chunk_root = root.spawn(2)
+
+    edges = _histogram_edges(_simulate_trials(params, min(PILOT_TRIALS, n_trials),
+                                              np.random.default_rng(pilot_seed)))
+    chunk_trials = max(1, MAX_CELLS_PER_CHUNK // max(n_skus, 1))
+    sizes = [min(chunk_trials, n_trials - start) for start in range(0, n_trials, chunk_trials)]
+    seeds = chunk_root.spawn(len(sizes))
+
+    if workers and workers > 1 and len(sizes) > 1:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes)), mp_context=context) as pool:
+            chunks = list(pool.map(_run_chunk, [params] * len(sizes), sizes, seeds,
+                                   [edges] * len(sizes), [bins] * len(sizes)))
+    else:
+        chunks = [_run_chunk(params, size, s, edges, bins) for size, s in zip(sizes, seeds)]
+
+    histograms = {key: sum(chunk[0][key] for chunk in chunks) for key in edges}
+    portfolio_samples = {
+        metric: np.concatenate([chunk[1][metric] for chunk in chunks])
+        for metric in ('revenue', 'cost')
+    }
+
+    def level_table(level, labels):
+        table = labels.copy()
+        for metric, title in (('revenue', 'Revenue'), ('cost', 'Cost'), ('lead_time', 'Lead Time')):
+            lo, hi = edges[(level, metric)]
+            p5, p50, p95 = _histogram_quantiles(histograms[(level, metric)], lo, hi, QUANTILES)
+            table[f'{title} P5'], table[f'{title} P50'], table[f'{title} P95'] = p5, p50, p95
+        table['Revenue VaR95'] = table['Revenue P50'] - table['Revenue P5']
+        return table
+
+    sku_table = level_table('sku', pd.DataFrame({
+        'SKU': params['sku'], 'Supplier name': params['supplier_of_sku'],
+    }))
+    supplier_table = level_table('supplier', pd.DataFrame({'Supplier name': params['suppliers']}))
+
+    revenue, cost = portfolio_samples['revenue'], portfolio_samples['cost']
+    r5, r50, r95 = np.quantile(revenue, QUANTILES)
+    c5, c50, c95 = np.quantile(cost, QUANTILES)
+    base_revenue = params['base_revenue'].sum()
+    portfolio = {
+        'trials': n_trials,
+        'base_revenue': base_revenue,
+        'revenue_p5': r5, 'revenue_p50': r50, 'revenue_p95': r95,
+        'revenue_var95': r50 - r5,
+        'cost_p5': c5, 'cost_p50': c50, 'cost_p95': c95,
+        'prob_revenue_below_base': float((revenue < base_revenue).mean()),
+    }
+    return {'sku': sku_table, 'supplier': supplier_table, 'portfolio': portfolio}
+
+if __name__ == "__main__":
+    results = run_monte_carlo(n_trials=100_000, seed=42)
+    print("\n🎲 Portfolio risk:")
+    for key, value in results['portfolio'].items():
+        print(f"- {key}: {value:,.2f}")
+    print("\n🏭 Supplier risk:\n", results['supplier'].round(2).to_string(index=False))
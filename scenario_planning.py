@@ -91,13 +91,19 @@
 #     prompt = generate_prompt_from_data("15% Demand Drop", demand_scenario)
 #     insight = get_llm_insight(prompt)
 #     print("\n🤖 LLM Recommendation:\n", insight) 
+import numpy as np
 import pandas as pd 
-import requests
+from data_source import SUPPLY_CHAIN_CSV, load_supply_chain
+from instrumentation import span
+from llm_client import generate, stream_generate
 
-data_path = "C:/Users/KATALA JEETHENDER/OneDrive/Desktop/college project modification/historical data/supply_chain_data.csv" 
+data_path = SUPPLY_CHAIN_CSV
+SCENARIO_COLUMNS = ['SKU', 'Price', 'Number of products sold', 'Revenue generated',
+                    'Lead time', 'Shipping costs']
 
+# Shared cached frame (only the columns scenarios use); simulate_* copy before writing.
 def load_supply_chain_data():
-    return pd.read_csv(data_path)
+    return load_supply_chain(SCENARIO_COLUMNS, path=data_path)
 
 def simulate_demand_change(df, percentage_change):
     df = df.copy()
@@ -115,6 +121,47 @@ def simulate_shipping_cost_increase(df, percent_increase):
     df['Simulated_Shipping_Cost'] = df['Shipping costs'] * (1 + percent_increase / 100)
     return df
 
+# === Batch scenario sweep ===
+# Every KPI is linear in its shock, so one pass over a compact (n_skus x 4)
+# matrix reduces the data to a handful of column totals; the whole scenario
+# grid is then evaluated by broadcasting those totals, never copying the frame.
+SWEEP_COLUMNS = ['Number of products sold', 'Price', 'Lead time', 'Shipping costs']
+
+def scenario_matrix(df):
+    return df[SWEEP_COLUMNS].to_numpy(dtype=np.float64)
+
+def sweep_scenarios(df, demand_changes=(0,), lead_times=(None,), shipping_changes=(0,)):
+    # lead_times: absolute lead time in days per scenario, None = keep each SKU's own.
+    matrix = scenario_matrix(df)
+    sold, price, lead, shipping = matrix.T
+    n_skus = len(matrix)
+    units_total = sold.sum()
+    revenue_total = sold @ price
+    lead_mean = lead.mean()
+    shipping_total = shipping.sum()
+
+    demand, lead_days, ship = np.meshgrid(
+        np.asarray(demand_changes, dtype=np.float64),
+        np.array([np.nan if t is None else t for t in lead_times], dtype=np.float64),
+        np.asarray(shipping_changes, dtype=np.float64),
+        indexing='ij',
+    )
+    demand, lead_days, ship = demand.ravel(), lead_days.ravel(), ship.ravel()
+    demand_factor = 1 + demand / 100
+    shipping_factor = 1 + ship / 100
+
+    return pd.DataFrame({
+        'Demand Change (%)': demand,
+        'Lead Time (days)': lead_days,
+        'Shipping Cost Change (%)': ship,
+        'Simulated Units': units_total * demand_factor,
+        'Total Revenue': revenue_total * demand_factor,
+        'Revenue Change (%)': (demand_factor - 1) * 100,
+        'Avg Lead Time': np.where(np.isnan(lead_days), lead_mean, lead_days),
+        'Total Shipping Cost': shipping_total * shipping_factor,
+        'Avg Shipping Cost': shipping_total * shipping_factor / n_skus,
+    })
+
 def summarize_impact(df, scenario):
     print(f"\n📊 Scenario Analysis: {scenario}")
     print("🔍 Impact Summary:")
@@ -134,10 +181,116 @@ def summarize_impact(df, scenario):
     if 'Shipping costs' in df.columns:
         print(f"- Avg Shipping Cost: ${df['Shipping costs'].mean():.2f}") 
 
-def generate_prompt_from_data(scenario_name, df):
+# === Composable scenarios ===
+# A Scenario stacks any number of shocks on top of a shared base frame. The
+# base is only ever read; derived columns are computed on demand and KPIs are
+# reductions, so live scenarios cost a few floats each rather than a frame copy.
+class Scenario:
+    def __init__(self, base, shocks=()):
+        self.base = base
+        self.shocks = tuple(shocks)
+        self._kpis = None
+
+    def _with(self, kind, value):
+        return Scenario(self.base, self.shocks + ((kind, value),))
+
+    def with_demand_change(self, percentage_change):
+        return self._with('demand', percentage_change)
+
+    def with_lead_time(self, new_lead_time):
+        return self._with('lead_time', new_lead_time)
+
+    def with_shipping_cost_increase(self, percent_increase):
+        return self._with('shipping', percent_increase)
+
+    # Stacked percentage shocks compound; an absolute lead time replaces the previous one.
+    def _factor(self, kind):
+        factor = 1.0
+        for shock_kind, value in self.shocks:
+            if shock_kind == kind:
+                factor *= 1 + value / 100
+        return factor
+
+    def _has(self, kind):
+        return any(shock_kind == kind for shock_kind, _ in self.shocks)
+
+    def _lead_time_override(self):
+        overrides = [value for kind, value in self.shocks if kind == 'lead_time']
+        return overrides[-1] if overrides else None
+
+    def _base_values(self, column):
+        return self.base[column].to_numpy(dtype=np.float64)
+
+    def _lead_column(self):
+        return 'Lead time' if 'Lead time' in self.base.columns else 'Lead times'
+
+    @property
+    def label(self):
+        parts = []
+        for kind, value in self.shocks:
+            if kind == 'demand':
+                parts.append(f"{abs(value)}% Demand {'Drop' if value < 0 else 'Increase'}")
+            elif kind == 'lead_time':
+                parts.append(f"Lead Time {value} Days")
+            else:
+                parts.append(f"Shipping Costs {'+' if value >= 0 else '-'}{abs(value)}%")
+        return " + ".join(parts) or "Base Case"
+
+    def column(self, name):
+        # Same columns the simulate_* functions add, built only when asked for.
+        if name == 'Simulated_Sales':
+            return self._base_values('Number of products sold') * self._factor('demand')
+        if name == 'Simulated_Revenue':
+            return self.column('Simulated_Sales') * self._base_values('Price')
+        if name == 'Simulated_Lead_Time':
+            override = self._lead_time_override()
+            base_lead = self._base_values(self._lead_column())
+            return base_lead if override is None else np.full(len(base_lead), float(override))
+        if name == 'Simulated_Shipping_Cost':
+            return self._base_values('Shipping costs') * self._factor('shipping')
+        return self._base_values(name)
+
+    def kpis(self):
+        if self._kpis is None:
+            if self._has('demand'):
+                sold = self._base_values('Number of products sold')
+                total_revenue = float(sold @ self._base_values('Price')) * self._factor('demand')
+            else:
+                total_revenue = float(self.base['Revenue generated'].sum())
+            override = self._lead_time_override()
+            avg_lead_time = float(self.base[self._lead_column()].mean()) if override is None else float(override)
+            shipping_total = float(self.base['Shipping costs'].sum()) * self._factor('shipping')
+            self._kpis = {
+                'total_revenue': total_revenue,
+                'avg_lead_time': avg_lead_time,
+                'avg_shipping_cost': shipping_total / len(self.base),
+                'total_shipping_cost': shipping_total,
+            }
+        return self._kpis
+
+def scenario_kpis(data):
+    # KPIs for a Scenario or for a frame produced by the simulate_* functions.
+    if isinstance(data, Scenario):
+        return data.kpis()
+    df = data
     total_revenue = df['Simulated_Revenue'].sum() if 'Simulated_Revenue' in df.columns else df['Revenue generated'].sum()
-    avg_lead_time = df['Lead time'].mean() if 'Lead time' in df.columns else df['Lead times'].mean()
-    avg_shipping = df['Shipping costs'].mean()
+    if 'Simulated_Lead_Time' in df.columns:
+        avg_lead_time = df['Simulated_Lead_Time'].mean()
+    else:
+        avg_lead_time = df['Lead time'].mean() if 'Lead time' in df.columns else df['Lead times'].mean()
+    shipping = df['Simulated_Shipping_Cost'] if 'Simulated_Shipping_Cost' in df.columns else df['Shipping costs']
+    return {
+        'total_revenue': total_revenue,
+        'avg_lead_time': avg_lead_time,
+        'avg_shipping_cost': shipping.mean(),
+        'total_shipping_cost': shipping.sum(),
+    }
+
+def generate_prompt_from_data(scenario_name, df):
+    kpis = scenario_kpis(df)
+    total_revenue = kpis['total_revenue']
+    avg_lead_time = kpis['avg_lead_time']
+    avg_shipping = kpis['avg_shipping_cost']
 
     prompt = f"""
 You are a supply chain analyst. The following scenario has been simulated: "{scenario_name}"
@@ -157,31 +310,34 @@ Respond with practical, business-savvy suggestions.
     return prompt     
 
 def get_llm_insight(prompt):
-    response = requests.post(
-        'http://localhost:11434/api/generate',
-        json={
-            "model": "tinyllama",
-            "prompt": prompt,
-            "stream": False
-        }
-    )
-    return response.json()['response'].strip()
+    return generate(prompt)
+
+def build_scenario(percentage_change: float, new_lead_time=None, shipping_increase=None):
+    # Label: e.g., "-10% Demand Drop" or "15% Demand Increase" (+ any extra shocks)
+    scenario = Scenario(load_supply_chain_data()).with_demand_change(percentage_change)
+    if new_lead_time is not None:
+        scenario = scenario.with_lead_time(new_lead_time)
+    if shipping_increase is not None:
+        scenario = scenario.with_shipping_cost_increase(shipping_increase)
+    return scenario
+
+def build_scenario_prompt(percentage_change: float, new_lead_time=None, shipping_increase=None):
+    scenario = build_scenario(percentage_change, new_lead_time, shipping_increase)
+    with span("prompt.build", analysis="scenario", scenario=scenario.label) as s:
+        prompt = generate_prompt_from_data(scenario.label, scenario)
+        s["attributes"]["chars"] = len(prompt)
+    return prompt
 
 # ✅ Function callable from agent_flow.py
-def get_scenario_summary(percentage_change: float):
-    df = load_supply_chain_data()
-    scenario_df = simulate_demand_change(df, percentage_change)
-
-    # Label: e.g., "-10% Demand Drop" or "15% Demand Increase"
-    if percentage_change < 0:
-        label = f"{abs(percentage_change)}% Demand Drop"
-    else:
-        label = f"{percentage_change}% Demand Increase"
-
-    prompt = generate_prompt_from_data(label, scenario_df)
+def get_scenario_summary(percentage_change: float, new_lead_time=None, shipping_increase=None):
+    prompt = build_scenario_prompt(percentage_change, new_lead_time, shipping_increase)
     insight = get_llm_insight(prompt)
     return insight
 
+# Token-by-token variant for the dashboard
+def stream_scenario_summary(percentage_change: float, new_lead_time=None, shipping_increase=None):
+    yield from stream_generate(build_scenario_prompt(percentage_change, new_lead_time, shipping_increase))
+
 # === Optional testing block ===
 if __name__ == "__main__":
     summary = get_scenario_summary(-15)  # You can change to any float
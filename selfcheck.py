@@ -0,0 +1,143 @@
+# selfcheck.py
+# Behaviour checks for the pieces that are easy to get subtly wrong. They run
+# on small synthetic inputs and local stubs, so no Ollama server is needed.
+#   python selfcheck.py             # every check
+#   python selfcheck.py retrieval   # selected checks
+
+import sys
+import traceback
+
+import numpy as np
+
+CHECKS = {}
+
+def check(name):
+    def register(fn):
+        CHECKS[name] = fn
+        return fn
+    return register
+
+# === Contract retrieval ===
+@check("retrieval")
+def check_retrieval_covers_every_contract():
+    # One contract whose many long chunks all match the question exactly must
+    # not crowd the others out of the global search or of the context budget:
+    # every contract's best chunk makes it into the default-size context.
+    import faiss
+    from load_contracts import MAX_CONTEXT_CHARS, _chunk_ids, encode, retrieve_contract_context
+
+    question = "Under what conditions can the agreement be terminated?"
+    filler = " Either party may terminate this agreement on written notice." * 40
+    contracts = {
+        "dominant.pdf": [question + filler] * 30,
+        "payment.pdf": ["Invoices are payable within 30 days." + filler, "Late payments accrue 1% monthly interest."],
+        "delivery.pdf": ["Goods ship within 5 business days." + filler, "Missed deliveries earn service credits.",
+                         "The supplier maintains 99% fill rate."],
+    }
+    index, chunks = None, {}
+    for doc_id, (name, texts) in enumerate(contracts.items()):
+        embeddings = np.asarray(encode(texts), dtype="float32")
+        index = index or faiss.IndexIDMap2(faiss.IndexFlatL2(embeddings.shape[1]))
+        ids = _chunk_ids(doc_id, len(texts))
+        index.add_with_ids(embeddings, ids)
+        for i, vector_id in enumerate(ids):
+            chunks[int(vector_id)] = {"file": name, "hash": name, "chunk": i, "text": texts[i]}
+
+    queries = {"Termination": question, "Payment": "When are invoices payable?"}
+    sections = retrieve_contract_context(index, chunks, queries, top_k=2)
+    for topic, excerpts in sections.items():
+        files = [excerpt.split("] ", 1)[0].lstrip("[") for excerpt in excerpts]
+        assert set(files) == set(contracts), (topic, files)
+        assert files[:len(contracts)] == sorted(set(files), key=files.index), f"{topic}: best chunks not interleaved first"
+        assert sum(map(len, excerpts)) <= MAX_CONTEXT_CHARS // len(queries), (topic, sum(map(len, excerpts)))
+
+# === LLM client against a stub Ollama ===
+@check("llm-client")
+def check_llm_client_retries_and_concurrency():
+    import threading
+
+    from benchmark import StubOllama
+    from llm_client import LLMClient, LLMError
+
+    def client(stub, **kwargs):
+        return LLMClient(base_url=stub.url, backoff=0.01, timeout=(1.0, 0.5), **kwargs)
+
+    # Dropped connections and 5xx answers are retried until one succeeds
+    with StubOllama(latency=0.01, tokens=4, faults=["drop", 503, 500]) as stub:
+        assert client(stub, max_retries=3).generate("hi") == "token token token token"
+        assert stub.requests == 4, stub.requests
+    with StubOllama(latency=0.01, tokens=4, faults=["drop", 502]) as stub:
+        assert "".join(client(stub, max_retries=2).stream("hi")) == "token " * 4
+        assert stub.requests == 3, stub.requests
+
+    # ...but not past max_retries, and never for client errors
+    with StubOllama(latency=0.01, tokens=4, faults=[503, 503, 503]) as stub:
+        try:
+            client(stub, max_retries=2).generate("hi")
+            raise AssertionError("expected LLMError after exhausting retries")
+        except LLMError:
+            assert stub.requests == 3, stub.requests
+    with StubOllama(latency=0.01, tokens=4, faults=[400]) as stub:
+        try:
+            client(stub).generate("hi")
+            raise AssertionError("expected LLMError on HTTP 400")
+        except LLMError:
+            assert stub.requests == 1, stub.requests
+
+    # A read timeout fails fast instead of being retried
+    with StubOllama(latency=0.01, tokens=4, faults=["hang"], hang_s=2.0) as stub:
+        try:
+            client(stub, max_retries=3).generate("hi")
+            raise AssertionError("expected LLMError on read timeout")
+        except LLMError:
+            assert stub.requests == 1, stub.requests
+
+    # In-flight requests never exceed max_concurrency
+    with StubOllama(latency=0.2, tokens=4, tokens_per_s=1000.0) as stub:
+        shared = client(stub, max_concurrency=2)
+        threads = [threading.Thread(target=shared.generate, args=(f"prompt {i}",)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert stub.requests == 6 and stub.max_in_flight == 2, (stub.requests, stub.max_in_flight)
+
+# === Supplier matching ===
+@check("supplier-match")
+def check_contained_name_reaches_review():
+    # A name contained in another ("Ante" in "Ante Dictum") shares a block and
+    # goes to review even when the two addresses disagree; it is not merged.
+    import pandas as pd
+
+    from supplier_master import MATCH_THRESHOLD, REVIEW_THRESHOLD, add_match_keys, candidate_pairs, score_pairs
+
+    df = add_match_keys(pd.DataFrame({
+        "name": ["Ante Corp.", "Ante Dictum LLC", "Tellus Industries"],
+        "street": ["P.O. Box 569, 9797 Fermentum Av.", "2809 Tincidunt, Road", "1 Main St."],
+        "postal_code": ["22685", "9148", "10001"],
+        "phone": [None, "1-767-324-1000", None],
+        "email": [None, "info@nec.net", None],
+    }, dtype="string"))
+    pairs = candidate_pairs(df)
+    assert (0, 1) in pairs, pairs
+    scored = score_pairs(df, pairs)
+    scores = {(a, b): score for a, b, score in scored.itertuples(index=False)}
+    assert REVIEW_THRESHOLD <= scores.get((0, 1), 0.0) < MATCH_THRESHOLD, scores
+
+def main(names):
+    selected = names or list(CHECKS)
+    unknown = [name for name in selected if name not in CHECKS]
+    if unknown:
+        raise SystemExit(f"Unknown checks: {', '.join(unknown)} (available: {', '.join(CHECKS)})")
+    failed = 0
+    for name in selected:
+        try:
+            CHECKS[name]()
+            print(f"✅ {name}")
+        except Exception:
+            failed += 1
+            print(f"❌ {name}\n{traceback.format_exc()}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
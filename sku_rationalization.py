@@ -27,55 +27,230 @@
 # # STEP 3: Show Recommendations
 # rationalization_summary = df[['SKU', 'Product type', 'Number of products sold', 'Profit Margin', 'Sales Velocity', 'Defect rates', 'SKU Recommendation']]
 # print(rationalization_summary)
+import os
+
+import numpy as np
 import pandas as pd
-import requests
+from data_source import SUPPLY_CHAIN_CSV, iter_supply_chain, load_cached, read_supply_chain
+from instrumentation import span
+from llm_client import generate, stream_generate
 
-# Load Data
-data_path = "C:/Users/KATALA JEETHENDER/OneDrive/Desktop/college project modification/historical data/supply_chain_data.csv"
-df = pd.read_csv(data_path)
+# Data is loaded lazily by load(); importing this module reads nothing.
+data_path = SUPPLY_CHAIN_CSV
+SKU_COLUMNS = ['SKU', 'Product type', 'Price', 'Number of products sold', 'Revenue generated',
+               'Stock levels', 'Manufacturing costs', 'Defect rates']
 
 # STEP 1: Compute Profit, Profit Margin, Sales Velocity
-df['Profit'] = df['Revenue generated'] - df['Manufacturing costs']
-df['Profit Margin'] = df['Profit'] / df['Revenue generated']
-df['Sales Velocity'] = df['Number of products sold'] / (df['Stock levels'] + 1)  # Avoid divide by zero
+def add_metrics(df):
+    df['Profit'] = df['Revenue generated'] - df['Manufacturing costs']
+    df['Profit Margin'] = df['Profit'] / df['Revenue generated']
+    df['Sales Velocity'] = df['Number of products sold'] / (df['Stock levels'] + 1)  # Avoid divide by zero
+    df['Performance Score'] = df['Profit Margin'] * df['Sales Velocity']
+    return df
 
 # STEP 2: Define Rules for Rationalization
-def classify_sku(row):
+KEEP = '✅ Keep'
+OPTIMIZE = '♻️ Bundle/Optimize'
+DISCONTINUE = '❌ Discontinue'
+
+# Rule table: "keep" needs every bound met; "optimize" needs any [low, high) range hit;
+# anything else is discontinued.
+SKU_RULES = {
+    "keep": {"min_margin": 0.25, "min_velocity": 1.0, "max_defect": 1.5},
+    "optimize": {"margin": (0.1, 0.25), "velocity": (0.5, 1.0), "defect": (1.5, 3.5)},
+}
+
+# Row-wise reference implementation (kept for clarity and equivalence checks)
+def classify_sku(row, rules=SKU_RULES):
     margin = row['Profit Margin']
     velocity = row['Sales Velocity']
     defect = row['Defect rates']
+    keep, optimize = rules["keep"], rules["optimize"]
     
-    if margin >= 0.25 and velocity >= 1.0 and defect < 1.5:
-        return '✅ Keep'
-    elif 0.1 <= margin < 0.25 or 0.5 <= velocity < 1.0 or 1.5 <= defect < 3.5:
-        return '♻️ Bundle/Optimize'
+    if margin >= keep["min_margin"] and velocity >= keep["min_velocity"] and defect < keep["max_defect"]:
+        return KEEP
+    elif (optimize["margin"][0] <= margin < optimize["margin"][1]
+          or optimize["velocity"][0] <= velocity < optimize["velocity"][1]
+          or optimize["defect"][0] <= defect < optimize["defect"][1]):
+        return OPTIMIZE
     else:
-        return '❌ Discontinue'
+        return DISCONTINUE
+
+def _in_range(values, bounds):
+    low, high = bounds
+    return (values >= low) & (values < high)
+
+# Vectorized classifier: same labels as classify_sku (NaN comparisons are False
+# in both), computed with whole-column masks instead of a Python call per row.
+def classify_skus(df, rules=SKU_RULES):
+    margin = df['Profit Margin'].to_numpy()
+    velocity = df['Sales Velocity'].to_numpy()
+    defect = df['Defect rates'].to_numpy()
+    keep, optimize = rules["keep"], rules["optimize"]
+
+    keep_mask = (margin >= keep["min_margin"]) & (velocity >= keep["min_velocity"]) & (defect < keep["max_defect"])
+    optimize_mask = (
+        _in_range(margin, optimize["margin"])
+        | _in_range(velocity, optimize["velocity"])
+        | _in_range(defect, optimize["defect"])
+    )
+    labels = np.select([keep_mask, optimize_mask], [KEEP, OPTIMIZE], default=DISCONTINUE)
+    return pd.Series(labels, index=df.index, dtype=object)
+
+def rationalize(df):
+    df = add_metrics(df)
+    df['SKU Recommendation'] = classify_skus(df)
+    return df
+
+def _read_and_rationalize(path):
+    return rationalize(read_supply_chain(path, SKU_COLUMNS))
 
-df['SKU Recommendation'] = df.apply(classify_sku, axis=1)
+# Cached until the CSV's content changes; refresh=True forces a re-read.
+def load(path=None, refresh=False):
+    return load_cached(path or data_path, _read_and_rationalize, refresh)
 
 # STEP 3: Print Summary
-rationalization_summary = df[['SKU', 'Product type', 'Number of products sold', 
-                              'Profit Margin', 'Sales Velocity', 'Defect rates', 
-                              'SKU Recommendation']]
-# print(rationalization_summary)
+SUMMARY_COLUMNS = ['SKU', 'Product type', 'Number of products sold',
+                   'Profit Margin', 'Sales Velocity', 'Defect rates',
+                   'SKU Recommendation']
+
+# Keeps `sku_rationalization.df` / `.rationalization_summary` working without
+# loading anything at import time.
+def __getattr__(name):
+    if name == "df":
+        return load()
+    if name == "rationalization_summary":
+        return load()[SUMMARY_COLUMNS]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Chart data for the dashboard, aggregated here so the browser only gets a
+# few rows per recommendation instead of one point per SKU.
+RECOMMENDATIONS = [KEEP, OPTIMIZE, DISCONTINUE]
+SCATTER_MAX_POINTS = 5000   # above this the performance matrix is binned
+SCATTER_BINS = 40           # bins per axis when binned
+
+def recommendation_counts(df):
+    return _counts_frame(df['SKU Recommendation'].value_counts().reindex(RECOMMENDATIONS, fill_value=0))
+
+def _counts_frame(counts):
+    total = counts.sum()
+    return pd.DataFrame({
+        'Recommendation': counts.index,
+        'Count': counts.to_numpy(),
+        'Percentage': (counts.to_numpy() / total * 100).round(1) if total else 0.0,
+    })
+
+MATRIX_AXES = ('Sales Velocity', 'Profit Margin')
+
+def _matrix_points(df):
+    frame = df[['SKU', *MATRIX_AXES, 'SKU Recommendation']]
+    return frame[np.isfinite(frame['Sales Velocity']) & np.isfinite(frame['Profit Margin'])]
+
+def _matrix_edges(points, bins):
+    # Edges span the 1st-99th percentiles so a few outliers don't squash the
+    # grid; values outside land in the edge cells. (low, bin width) per axis.
+    edges = {}
+    for axis in MATRIX_AXES:
+        low, high = np.percentile(points[axis].to_numpy(dtype=np.float64), [1, 99])
+        edges[axis] = (low, (high - low) / bins if high > low else 1.0)
+    return edges
+
+def _matrix_bin(points, edges, bins):
+    # Per-cell SKU counts and per-axis value sums. Each SKU maps to one cell id
+    # (recommendation, velocity bin, margin bin) and bincount does the grouping.
+    cell = pd.Categorical(points['SKU Recommendation'], categories=RECOMMENDATIONS).codes.astype(np.int64)
+    for axis, (low, width) in edges.items():
+        values = points[axis].to_numpy(dtype=np.float64)
+        cell = cell * bins + np.clip(((values - low) / width).astype(np.int64), 0, bins - 1)
+    n_cells = len(RECOMMENDATIONS) * bins * bins
+    sums = {axis: np.bincount(cell, weights=points[axis].to_numpy(dtype=np.float64), minlength=n_cells)
+            for axis in MATRIX_AXES}
+    return np.bincount(cell, minlength=n_cells), sums
+
+def _matrix_frame(counts, sums, bins):
+    # One row per occupied cell, placed at the mean of its SKUs.
+    occupied = np.flatnonzero(counts)
+    return pd.DataFrame({
+        axis: sums[axis][occupied] / counts[occupied] for axis in MATRIX_AXES
+    }).assign(**{
+        'SKU Recommendation': np.asarray(RECOMMENDATIONS, dtype=object)[occupied // (bins * bins)],
+        'Count': counts[occupied],
+    })
+
+def performance_matrix(df, max_points=SCATTER_MAX_POINTS, bins=SCATTER_BINS):
+    # Sales Velocity vs Profit Margin per SKU. Small catalogs come back as raw
+    # points (Count = 1); large ones as a bins x bins grid per recommendation,
+    # each cell placed at the mean of its SKUs and carrying their count.
+    points = _matrix_points(df)
+    if len(points) <= max_points:
+        return points.assign(Count=1).reset_index(drop=True)
+    counts, sums = _matrix_bin(points, _matrix_edges(points, bins), bins)
+    return _matrix_frame(counts, sums, bins)
+
+# Which SKUs of each bucket the LLM sees: (score column, ascending). Discontinue
+# shows the worst performers (lowest margin x velocity, so fast-selling
+# loss-makers first), Bundle/Optimize the most revenue at stake, Keep the best.
+SKU_RANKING = {
+    DISCONTINUE: ('Performance Score', True),
+    OPTIMIZE: ('Revenue generated', False),
+    KEEP: ('Performance Score', False),
+}
+PROMPT_TOP_K = int(os.environ.get("SKU_PROMPT_TOP_K", "3"))
+PROMPT_COLUMNS = ['SKU', 'Profit Margin', 'Sales Velocity', 'Defect rates']
+
+def _smallest_k(key, k):
+    # Positions of the k smallest keys ordered by (key, position), NaN last.
+    # argpartition finds the k-th value in O(n); only ties at that value need
+    # the position order, which keeps the pick deterministic.
+    key = np.where(np.isnan(key), np.inf, key)
+    if k <= 0 or len(key) == 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= len(key):
+        return np.lexsort((np.arange(len(key)), key))
+    kth = key[np.argpartition(key, k - 1)[k - 1]]
+    below = np.flatnonzero(key < kth)
+    ties = np.flatnonzero(key == kth)[:k - len(below)]
+    chosen = np.concatenate([below, ties])
+    return chosen[np.lexsort((chosen, key[chosen]))]
+
+def ranking_key(df, label, ranking=SKU_RANKING, rows=None):
+    # Score oriented so that smaller means "show first", for every row or only
+    # the given positions (read from the column array, not a copied frame).
+    column, ascending = ranking[label]
+    values = df[column].to_numpy(dtype=np.float64)
+    if rows is not None:
+        values = values[rows]
+    return values if ascending else -values
+
+def top_skus(df, k=PROMPT_TOP_K, ranking=SKU_RANKING):
+    # Top-k SKUs per recommendation bucket, O(n) per bucket instead of a sort.
+    codes = pd.Categorical(df['SKU Recommendation'], categories=list(ranking)).codes
+    selected = {}
+    for code, label in enumerate(ranking):
+        rows = np.flatnonzero(codes == code)
+        picks = rows[_smallest_k(ranking_key(df, label, ranking, rows), k)]
+        selected[label] = df.iloc[picks]  # only the k picked rows are materialized
+    return selected
 
 # STEP 4: Generate Prompt for LLM
-def generate_rationalization_prompt(df):
-    top_discontinue = df[df['SKU Recommendation'] == '❌ Discontinue'].head(3)
-    top_bundle = df[df['SKU Recommendation'] == '♻️ Bundle/Optimize'].head(3)
-    top_keep = df[df['SKU Recommendation'] == '✅ Keep'].head(3)
+def generate_rationalization_prompt(df, k=PROMPT_TOP_K):
+    return format_rationalization_prompt(top_skus(df, k))
+
+def format_rationalization_prompt(top):
+    top_discontinue = top[DISCONTINUE]
+    top_bundle = top[OPTIMIZE]
+    top_keep = top[KEEP]
     prompt = f"""
 You are a supply chain strategy expert. Analyze the following SKU performance data and provide specific actionable insights.
 
 📉 Discontinue Candidates:
-{top_discontinue[['SKU', 'Profit Margin', 'Sales Velocity', 'Defect rates']].to_string(index=False)}
+{top_discontinue[PROMPT_COLUMNS].to_string(index=False)}
 
 ♻️ Bundle/Optimize Candidates:
-{top_bundle[['SKU', 'Profit Margin', 'Sales Velocity', 'Defect rates']].to_string(index=False)}
+{top_bundle[PROMPT_COLUMNS].to_string(index=False)}
 
 📈 High-Performing SKUs:
-{top_keep[['SKU', 'Profit Margin', 'Sales Velocity', 'Defect rates']].to_string(index=False)}
+{top_keep[PROMPT_COLUMNS].to_string(index=False)}
 
 Instructions:
 1. For each Discontinue candidate, explain why it is underperforming (using actual metrics).
@@ -89,26 +264,137 @@ Format:
     
     return prompt
 
+# === Streaming mode: files larger than RAM ===
+# The prompt only needs bucket counts and the top-k rows per bucket, so a file
+# can be rationalized chunk by chunk keeping at most k candidate rows per
+# bucket; memory depends on the chunk size, not the file size.
+SKU_STREAM_CHUNK_ROWS = int(os.environ.get("SKU_STREAM_CHUNK_ROWS", "250000"))
+SKU_STREAM_MIN_BYTES = int(os.environ.get("SKU_STREAM_MIN_BYTES", str(512 * 1024 ** 2)))  # 0 = always stream
+
+class StreamingRationalization:
+    def __init__(self, k=PROMPT_TOP_K, ranking=SKU_RANKING):
+        self.k = k
+        self.ranking = ranking
+        self.rows = 0
+        self.counts = pd.Series(0, index=RECOMMENDATIONS, dtype=np.int64)
+        self.candidates = {label: None for label in ranking}
+
+    def update(self, chunk):
+        chunk = rationalize(chunk.reset_index(drop=True))
+        chunk['_position'] = np.arange(self.rows, self.rows + len(chunk))
+        self.rows += len(chunk)
+        self.counts += chunk['SKU Recommendation'].value_counts().reindex(RECOMMENDATIONS, fill_value=0)
+        for label, picks in top_skus(chunk, self.k, self.ranking).items():
+            if len(picks):
+                self._merge(label, picks)
+        return self
+
+    def _merge(self, label, picks):
+        # Keeps the k best of (current candidates + this chunk's top k) under
+        # the same (key, file position) order as _smallest_k, NaN last, so the
+        # result equals top_skus over the whole file.
+        pool = picks if self.candidates[label] is None else pd.concat([self.candidates[label], picks], ignore_index=True)
+        key = ranking_key(pool, label, self.ranking)
+        key = np.where(np.isnan(key), np.inf, key)
+        order = np.lexsort((pool['_position'].to_numpy(), key))[:self.k]
+        self.candidates[label] = pool.iloc[order].reset_index(drop=True)
+
+    def top_skus(self):
+        return {
+            label: frame.drop(columns='_position') if frame is not None else pd.DataFrame(columns=PROMPT_COLUMNS)
+            for label, frame in self.candidates.items()
+        }
+
+    def recommendation_counts(self):
+        return _counts_frame(self.counts)
+
+    def prompt(self):
+        return format_rationalization_prompt(self.top_skus())
+
+def rationalize_stream(path=None, chunk_rows=SKU_STREAM_CHUNK_ROWS, k=PROMPT_TOP_K):
+    state = StreamingRationalization(k)
+    with span("sku.stream", chunk_rows=chunk_rows) as s:
+        for chunk in iter_supply_chain(path or data_path, SKU_COLUMNS, chunk_rows):
+            state.update(chunk)
+        s["attributes"]["rows"] = state.rows
+    return state
+
+def _stream_state(path, k):
+    return rationalize_stream(path, k=k)
+
+def stream_state(path=None, k=PROMPT_TOP_K):
+    # Streaming state cached per data version; shared by the prompt and charts.
+    return load_cached(path or data_path, _stream_state, variant=k)
+
+SCATTER_SAMPLE_ROWS = 20_000  # uniform sample the streamed grid's edges come from
+
+def performance_matrix_stream(path=None, chunk_rows=SKU_STREAM_CHUNK_ROWS, max_points=SCATTER_MAX_POINTS,
+                              bins=SCATTER_BINS, sample_rows=SCATTER_SAMPLE_ROWS):
+    # performance_matrix for files larger than RAM, in two chunked passes. The
+    # first keeps a uniform sample (the rows with the smallest random keys) and
+    # places the percentile edges on it; the second bins every row. Files with
+    # at most max_points SKUs come back as raw points, as in memory.
+    path = path or data_path
+    rng = np.random.default_rng(0)
+    sample, total = None, 0
+    with span("sku.matrix_stream", chunk_rows=chunk_rows) as s:
+        for chunk in iter_supply_chain(path, SKU_COLUMNS, chunk_rows):
+            points = _matrix_points(rationalize(chunk.reset_index(drop=True)))
+            points = points.assign(_position=np.arange(total, total + len(points)), _key=rng.random(len(points)))
+            total += len(points)
+            pool = points if sample is None else pd.concat([sample, points], ignore_index=True)
+            sample = pool.nsmallest(sample_rows, '_key')
+        s["attributes"]["rows"] = total
+        if sample is None:
+            return pd.DataFrame(columns=['SKU', *MATRIX_AXES, 'SKU Recommendation', 'Count'])
+        if total <= max_points:
+            points = sample.sort_values('_position').drop(columns=['_position', '_key'])
+            return points.assign(Count=1).reset_index(drop=True)
+
+        edges = _matrix_edges(sample, bins)
+        counts, sums = 0, dict.fromkeys(MATRIX_AXES, 0)
+        for chunk in iter_supply_chain(path, SKU_COLUMNS, chunk_rows):
+            chunk_counts, chunk_sums = _matrix_bin(_matrix_points(rationalize(chunk.reset_index(drop=True))), edges, bins)
+            counts = counts + chunk_counts
+            sums = {axis: sums[axis] + chunk_sums[axis] for axis in MATRIX_AXES}
+    return _matrix_frame(counts, sums, bins)
+
+def use_streaming(path=None):
+    return os.path.getsize(path or data_path) >= SKU_STREAM_MIN_BYTES
+
+def build_sku_prompt(streaming=None):
+    # Large files (or streaming=True) go through the chunked pass; the small
+    # state is cached per data version just like the full frame.
+    if streaming is None:
+        streaming = use_streaming()
+    if streaming:
+        state = stream_state()
+        with span("prompt.build", analysis="sku", streaming=True) as s:
+            prompt = state.prompt()
+            s["attributes"]["chars"] = len(prompt)
+        return prompt
+    df = load()
+    with span("prompt.build", analysis="sku") as s:
+        prompt = generate_rationalization_prompt(df)
+        s["attributes"]["chars"] = len(prompt)
+    return prompt
+
 # STEP 5: Get Insight from TinyLLaMA
 def get_llm_insight(prompt):
-    response = requests.post(
-        'http://localhost:11434/api/generate',
-        json={
-            "model": "tinyllama",
-            "prompt": prompt,
-            "stream": False
-        }
-    )
-    return response.json()['response'].strip() 
+    return generate(prompt) 
 
 # ✅ FUNCTION to call from LangGraph
-def get_sku_summary():
-    prompt = generate_rationalization_prompt(df)
+def get_sku_summary(streaming=None):
+    prompt = build_sku_prompt(streaming)
     return get_llm_insight(prompt) 
 
+# Token-by-token variant for the dashboard
+def stream_sku_summary(streaming=None):
+    yield from stream_generate(build_sku_prompt(streaming))
+
 # STEP 6: Run All Together
 if __name__ == "__main__":
-    prompt = generate_rationalization_prompt(df)
+    prompt = build_sku_prompt()
     insight = get_llm_insight(prompt)
     print("\n🤖 LLM Recommendation:\n", insight) 
 
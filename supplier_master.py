@@ -0,0 +1,337 @@
+# supplier_master.py
+# Unified supplier master built from the three supplier files in historical data/.
+# Each source is mapped onto one schema, names/addresses are normalized, and
+# duplicate entities are found with blocking + fuzzy matching, so the number of
+# compared pairs grows with the data instead of with its square.
+
+import math
+import os
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+from data_source import DATA_DIR, PARQUET_DIR, pq
+from instrumentation import span
+
+# === Source schemas ===
+# Source column -> master column. SGE packs city, region and postal code into
+# one "City State ZIP" field and has three phone columns; GPS calls the region
+# "State", medical calls it "Region". SGE and medical headers carry a UTF-8 BOM.
+SUPPLIER_SOURCES = {
+    "GPS": {
+        "file": "GPS_suppliers.csv",
+        "columns": {
+            "ID": "source_id", "Name": "name", "Street Address": "street", "City": "city",
+            "State": "region", "Zip": "postal_code", "Website": "website",
+            "Contact Name": "contact_name", "Contact Email": "email", "Contact Phone": "phone",
+        },
+    },
+    "SGE": {
+        "file": "SGE_suppliers.csv",
+        "columns": {
+            "ID": "source_id", "Name": "name", "Address 1": "street", "City State ZIP": "city_region_postal",
+            "SMART Supplier ID": "smart_supplier_id", "FEIN": "fein", "Contact Person": "contact_name",
+            "Email": "email", "Tol Free Telephone": "phone_toll_free", "Local Telephone": "phone_local",
+            "Cell Phone": "phone_cell",
+        },
+    },
+    "medical": {
+        "file": "medical_suppliers.csv",
+        "columns": {
+            "ID": "source_id", "Name": "name", "Street Address": "street", "City": "city",
+            "Region": "region", "Zip": "postal_code", "Website": "website",
+            "Contact Name": "contact_name", "Contact Email": "email", "Contact Phone": "phone",
+        },
+    },
+}
+
+SUPPLIER_COLUMNS = [
+    "source", "source_id", "name", "street", "city", "region", "postal_code", "website",
+    "contact_name", "email", "phone", "smart_supplier_id", "fein",
+]
+# "string" keeps missing values as <NA> (astype(str) would turn them into "nan")
+SUPPLIER_DTYPES = {column: "string" for column in SUPPLIER_COLUMNS} | {"source": "category"}
+
+# Legal forms dropped from the match key ("Ante Corp." and "Ante Corporation" -> "ante")
+LEGAL_FORMS = [
+    "incorporated", "inc", "corporation", "corp", "company", "co", "limited", "ltd",
+    "llc", "llp", "lp", "plc", "pc", "sci", "gmbh", "sa",
+]
+
+# === Loading and normalization ===
+def _split_city_region_postal(values):
+    # "Windsor, Ontario K9E 3P3" -> ("Windsor", "Ontario", "K9E 3P3"): the city is
+    # everything before the last comma, the postal code the trailing tokens that
+    # contain a digit, the region whatever is left.
+    parts = values.str.rsplit(",", n=1, expand=True).reindex(columns=[0, 1])
+    city = parts[0].str.strip()
+    rest = parts[1].str.strip()
+    postal = rest.str.extract(r"((?:\S*\d\S*\s*)+)$", expand=False).str.strip()
+    region = rest.str.replace(r"((?:\S*\d\S*\s*)+)$", "", regex=True).str.strip()
+    return city, region.mask(region == ""), postal
+
+def read_supplier_source(source, data_dir=DATA_DIR):
+    spec = SUPPLIER_SOURCES[source]
+    raw = pd.read_csv(
+        os.path.join(data_dir, spec["file"]),
+        dtype=str,
+        encoding="utf-8-sig",  # strips the BOM from the first header
+        usecols=list(spec["columns"]),
+        keep_default_na=False,
+    )
+    df = raw.rename(columns=spec["columns"]).astype("string").apply(lambda column: column.str.strip())
+    df = df.mask(df == "")
+
+    if "city_region_postal" in df:
+        df["city"], df["region"], df["postal_code"] = _split_city_region_postal(df.pop("city_region_postal"))
+    phones = [column for column in ("phone_local", "phone_cell", "phone_toll_free") if column in df]
+    if phones:
+        df["phone"] = df[phones[0]]
+        for column in phones[1:]:
+            df["phone"] = df["phone"].fillna(df[column])
+        df = df.drop(columns=phones)
+
+    df["source"] = source
+    return df.reindex(columns=SUPPLIER_COLUMNS).astype(SUPPLIER_DTYPES)
+
+def _ascii_lower(values):
+    return (values.fillna("").str.normalize("NFKD").str.encode("ascii", "ignore")
+            .str.decode("ascii").str.lower())
+
+_LEGAL_FORMS_RE = r"\b(?:" + "|".join(LEGAL_FORMS) + r")\b"
+
+def add_match_keys(df):
+    # Vectorized normalization used by blocking and scoring.
+    name = _ascii_lower(df["name"]).str.replace(r"[^a-z0-9 ]", " ", regex=True)
+    df["name_key"] = (name.str.replace(_LEGAL_FORMS_RE, " ", regex=True)
+                      .str.split().str.join(" "))
+    # A name that is only a legal form keeps its original words
+    df["name_key"] = df["name_key"].where(df["name_key"] != "", name.str.split().str.join(" "))
+    df["street_key"] = (_ascii_lower(df["street"]).str.replace(r"[^a-z0-9 ]", " ", regex=True)
+                        .str.split().str.join(" "))
+    df["street_numbers"] = df["street_key"].str.findall(r"\d+").str.join(" ")
+    df["postal_key"] = _ascii_lower(df["postal_code"]).str.replace(r"[^a-z0-9]", "", regex=True)
+    df["phone_key"] = df["phone"].fillna("").str.replace(r"\D", "", regex=True).str[-7:]
+    df["email_domain"] = _ascii_lower(df["email"]).str.extract(r"@(.+)$", expand=False).fillna("")
+    return df
+
+def load_suppliers(data_dir=DATA_DIR):
+    frames = [read_supplier_source(source, data_dir) for source in SUPPLIER_SOURCES]
+    df = pd.concat(frames, ignore_index=True)
+    df["source"] = df["source"].astype(pd.CategoricalDtype(list(SUPPLIER_SOURCES)))
+    return add_match_keys(df)
+
+# === Blocking ===
+BLOCK_PAIRWISE_LIMIT = 50   # blocks up to this size compare every pair
+NEIGHBOURHOOD_WINDOW = 10   # larger blocks compare each record with its next neighbours by name
+
+def blocking_keys(df):
+    # A record shares a block with any record that has the same first name
+    # token, postal code, phone number or email domain.
+    keys = {
+        "name": df["name_key"].str.split().str[0].fillna(""),
+        "postal": df["postal_key"],
+        "phone": df["phone_key"].where(df["phone_key"].str.len() == 7, ""),
+        "email": df["email_domain"],
+    }
+    return {kind: values.to_numpy(dtype=object) for kind, values in keys.items()}
+
+def candidate_pairs(df, pairwise_limit=BLOCK_PAIRWISE_LIMIT, window=NEIGHBOURHOOD_WINDOW):
+    # Pairs (i, j), i < j, that share at least one block. Oversized blocks (a
+    # common first word, a shared mail domain) fall back to a sorted
+    # neighbourhood so no block costs more than O(size * window).
+    name_keys = df["name_key"].to_numpy(dtype=object)
+    pairs = set()
+    for values in blocking_keys(df).values():
+        blocks = defaultdict(list)
+        for row, key in enumerate(values):
+            if key:
+                blocks[key].append(row)
+        for rows in blocks.values():
+            if len(rows) < 2:
+                continue
+            if len(rows) <= pairwise_limit:
+                pairs.update((a, b) for i, a in enumerate(rows) for b in rows[i + 1:])
+                continue
+            rows = sorted(rows, key=lambda row: name_keys[row])
+            for i, a in enumerate(rows):
+                pairs.update((min(a, b), max(a, b)) for b in rows[i + 1:i + 1 + window])
+    return pairs
+
+# === Scoring ===
+MATCH_THRESHOLD = 0.85      # merged into one master record
+REVIEW_THRESHOLD = 0.65     # reported for manual review; lower pairs are dropped
+CONTAINED_NAME_SCORE = 0.7  # "Ante" vs "Ante Dictum": worth a look, needs evidence to merge
+TOKEN_MATCH_RATIO = 0.85    # "industries" ~ "industris"
+STREET_MATCH_RATIO = 0.8
+
+def _matcher(a, b):
+    return SequenceMatcher(None, a, b, autojunk=False)
+
+def _similar(a, b, threshold):
+    # ratio() >= threshold, trying the cheap upper bounds first (the length
+    # bound needs no matcher at all)
+    if a == b:
+        return True
+    if 2 * min(len(a), len(b)) < threshold * (len(a) + len(b)):
+        return False
+    matcher = _matcher(a, b)
+    return (matcher.real_quick_ratio() >= threshold and matcher.quick_ratio() >= threshold
+            and matcher.ratio() >= threshold)
+
+def token_weights(name_keys):
+    # IDF per name token, so shared common words ("electronics", "industries")
+    # count for little and distinctive ones for a lot.
+    counts = Counter(token for key in name_keys for token in set(key.split()))
+    n = max(len(name_keys), 1)
+    return {token: math.log((n + 1) / (count + 0.5)) for token, count in counts.items()}
+
+def _token_overlap(tokens_a, tokens_b, weights):
+    # IDF-weighted overlap; tokens spelled nearly alike count as shared.
+    only_b = tokens_b - tokens_a
+    shared = {t for t in tokens_a if t in tokens_b or any(_similar(t, u, TOKEN_MATCH_RATIO) for u in only_b)}
+    weight = lambda tokens: sum(weights.get(t, 1.0) for t in tokens)
+    union = weight(tokens_a) + weight(only_b) - weight(shared - tokens_b)
+    return weight(shared) / union if union > 0 else 0.0
+
+def score_pair(a, b, weights, floor=REVIEW_THRESHOLD):
+    # Name score: mean of character similarity and token overlap, at least
+    # CONTAINED_NAME_SCORE when one name's words all appear in the other.
+    # Agreeing postal code/phone/email domain/street raise it; a differing
+    # postal code or street lowers it, but never below `floor` for a name that
+    # reaches it on its own: a conflicting address (a branch, a move) blocks
+    # the merge, not the review. Returns None for pairs that cannot reach
+    # `floor`, skipping the exact character ratio for them.
+    support = conflict = 0.0
+    if a["postal_key"] and b["postal_key"]:
+        if a["postal_key"] == b["postal_key"]:
+            support += 0.1
+        else:
+            conflict += 0.2
+    if len(a["phone_key"]) == 7 and a["phone_key"] == b["phone_key"]:
+        support += 0.1
+    if a["email_domain"] and a["email_domain"] == b["email_domain"]:
+        support += 0.1
+    if a["street_key"] and b["street_key"]:
+        if (a["street_numbers"] == b["street_numbers"]
+                and _similar(a["street_key"], b["street_key"], STREET_MATCH_RATIO)):
+            support += 0.1
+        else:
+            conflict += 0.1
+
+    def combined(name):
+        score = name + support
+        return max(score - conflict, min(score, floor)) if conflict else score
+
+    name_a, name_b = a["name_key"], b["name_key"]
+    if not name_a or not name_b:
+        return None
+    if name_a == name_b:
+        name = 1.0
+    else:
+        tokens_a, tokens_b = set(name_a.split()), set(name_b.split())
+        overlap = _token_overlap(tokens_a, tokens_b, weights)
+        contained = CONTAINED_NAME_SCORE if tokens_a <= tokens_b or tokens_b <= tokens_a else 0.0
+        if combined(max((1 + overlap) / 2, contained)) < floor:
+            return None
+        matcher = _matcher(name_a, name_b)
+        if combined(max((matcher.quick_ratio() + overlap) / 2, contained)) < floor:
+            return None
+        name = max((matcher.ratio() + overlap) / 2, contained)
+    score = min(max(combined(name), 0.0), 1.0)
+    return score if score >= floor else None
+
+def score_pairs(df, pairs, floor=REVIEW_THRESHOLD):
+    # Scored pairs at or above `floor`, best first.
+    keys = df[["name_key", "street_key", "street_numbers", "postal_key", "phone_key", "email_domain"]].astype(object)
+    records = keys.fillna("").to_dict("records")
+    weights = token_weights(keys["name_key"].tolist())
+    scored = []
+    for a, b in pairs:
+        score = score_pair(records[a], records[b], weights, floor)
+        if score is not None:
+            scored.append((a, b, score))
+    return pd.DataFrame(scored, columns=["left", "right", "score"]).sort_values(
+        ["score", "left", "right"], ascending=[False, True, True], ignore_index=True
+    )
+
+# === Clustering ===
+def _cluster(n_records, matches):
+    # Union-find with path halving; returns a cluster label per record,
+    # numbered in order of each cluster's first record.
+    parent = np.arange(n_records)
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in matches:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+    roots = np.array([find(x) for x in range(n_records)])
+    return pd.factorize(roots)[0]
+
+def _golden_records(df):
+    # One row per master id: each field taken from the most complete record
+    # that has it, plus the contributing sources.
+    completeness = df[SUPPLIER_COLUMNS].notna().sum(axis=1)
+    ordered = df.assign(_completeness=completeness).sort_values(
+        ["master_id", "_completeness"], ascending=[True, False], kind="stable"
+    )
+    grouped = ordered.groupby("master_id", sort=True)
+    master = grouped[[c for c in SUPPLIER_COLUMNS if c not in ("source", "source_id")]].first()
+    master["sources"] = grouped["source"].agg(lambda s: ",".join(sorted(set(s.astype(str))))).astype("string")
+    master["records"] = grouped.size()
+    return master.reset_index()
+
+def build_supplier_master(data_dir=DATA_DIR, match_threshold=MATCH_THRESHOLD, review_threshold=REVIEW_THRESHOLD):
+    # Returns {"records": every source row with its master_id,
+    #          "master": one golden record per entity,
+    #          "review": scored pairs between the review and match thresholds}.
+    with span("suppliers.load") as s:
+        df = load_suppliers(data_dir)
+        s["attributes"]["records"] = len(df)
+    with span("suppliers.match") as s:
+        pairs = candidate_pairs(df)
+        scored = score_pairs(df, pairs, review_threshold)
+        s["attributes"].update(candidate_pairs=len(pairs))
+    matches = scored[scored["score"] >= match_threshold]
+    df["master_id"] = _cluster(len(df), zip(matches["left"], matches["right"]))
+
+    review = scored[(scored["score"] >= review_threshold) & (scored["score"] < match_threshold)]
+    review = review.assign(
+        left_name=df["name"].to_numpy()[review["left"]], left_source=df["source"].to_numpy()[review["left"]],
+        right_name=df["name"].to_numpy()[review["right"]], right_source=df["source"].to_numpy()[review["right"]],
+    )
+    records = df[["master_id"] + SUPPLIER_COLUMNS]
+    return {"records": records, "master": _golden_records(records), "review": review.reset_index(drop=True)}
+
+def write_supplier_master(master, target_dir=PARQUET_DIR):
+    # Parquet when pyarrow is available, CSV otherwise.
+    os.makedirs(target_dir, exist_ok=True)
+    if pq is not None:
+        path = os.path.join(target_dir, "supplier_master.parquet")
+        master.to_parquet(path, index=False)
+    else:
+        path = os.path.join(target_dir, "supplier_master.csv")
+        master.to_csv(path, index=False)
+    return path
+
+if __name__ == "__main__":
+    result = build_supplier_master()
+    records, master, review = result["records"], result["master"], result["review"]
+    print(f"📇 {len(records)} supplier records from {len(SUPPLIER_SOURCES)} sources → {len(master)} master suppliers")
+    merged = master[master["records"] > 1]
+    for _, row in merged.iterrows():
+        names = records.loc[records["master_id"] == row["master_id"], "name"].tolist()
+        print(f"🔗 {' = '.join(names)} ({row['sources']})")
+    if len(review):
+        print(f"\n🔍 {len(review)} pairs to review:")
+        for _, row in review.iterrows():
+            print(f"   {row['score']:.2f}  {row['left_name']} ({row['left_source']}) ~ {row['right_name']} ({row['right_source']})")
+    print(f"\n💾 Saved to {write_supplier_master(master)}")
@@ -0,0 +1,273 @@
+# supplier_scorecards.py
+# Supplier scorecards kept as materialized aggregates in SQLite. Each group
+# stores counts, sums and sums of squares, so new rows appended to the CSV are
+# folded in with an UPSERT and reads cost O(#groups) instead of a group-by over
+# every row. A byte-offset watermark records how far the CSV has been consumed.
+# Aggregates and watermark are both keyed on the CSV's absolute path, so one
+# database can serve several source files.
+
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data_source import CSV_CHUNK_ROWS, SUPPLY_CHAIN_CSV, SUPPLY_CHAIN_DTYPES, _csv_read_dtypes
+from instrumentation import span
+
+SCORECARD_DB_PATH = os.environ.get("SCORECARD_DB_PATH", "./.cache/scorecards.sqlite")
+
+# Source column -> column prefix in the aggregate tables
+SCORECARD_METRICS = {
+    "Lead time": "lead_time",
+    "Defect rates": "defect_rate",
+    "Manufacturing costs": "manufacturing_cost",
+    "Shipping costs": "shipping_cost",
+}
+INSPECTION_OUTCOMES = {"Fail": "fail_count", "Pass": "pass_count", "Pending": "pending_count"}
+
+# Grain name -> (table, source key columns, table key columns)
+SCORECARD_GRAINS = {
+    "supplier": ("scorecard_supplier", ["Supplier name"], ["supplier"]),
+    "supplier_location_carrier": (
+        "scorecard_supplier_location_carrier",
+        ["Supplier name", "Location", "Shipping carriers"],
+        ["supplier", "location", "carrier"],
+    ),
+}
+SCORECARD_COLUMNS = (
+    [key for _, keys, _ in SCORECARD_GRAINS.values() for key in keys if key != "Supplier name"]
+    + ["Supplier name", "Inspection results"] + list(SCORECARD_METRICS)
+)
+ANCHOR_BYTES = 4096  # bytes before the watermark re-checked to detect a rewritten file
+
+def _value_columns():
+    columns = ["row_count"] + list(INSPECTION_OUTCOMES.values())
+    for prefix in SCORECARD_METRICS.values():
+        columns += [f"{prefix}_n", f"{prefix}_sum", f"{prefix}_sumsq"]
+    return columns
+
+VALUE_COLUMNS = _value_columns()
+
+# === Chunk aggregation ===
+def aggregate_chunk(chunk, keys):
+    # Per-group partial aggregates for one chunk of rows; these add up exactly
+    # across chunks, which is what makes incremental maintenance possible.
+    frame = pd.DataFrame({"row_count": np.ones(len(chunk), dtype=np.int64)}, index=chunk.index)
+    inspection = chunk["Inspection results"]
+    for outcome, column in INSPECTION_OUTCOMES.items():
+        frame[column] = (inspection == outcome).astype(np.int64)
+    for source, prefix in SCORECARD_METRICS.items():
+        values = chunk[source].astype(np.float64)
+        frame[f"{prefix}_n"] = values.notna().astype(np.int64)
+        frame[f"{prefix}_sum"] = values.fillna(0.0)
+        frame[f"{prefix}_sumsq"] = values.fillna(0.0) ** 2
+    frame[keys] = chunk[keys].astype(str)
+    return frame.groupby(keys, sort=False)[VALUE_COLUMNS].sum().reset_index()
+
+class _RangeReader(io.RawIOBase):
+    # File view limited to [start, end), so pandas never sees a partially
+    # written last line.
+    def __init__(self, f, start, end):
+        self._f = f
+        self._remaining = end - start
+        f.seek(start)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._remaining <= 0:
+            return 0
+        data = self._f.read(min(len(buffer), self._remaining))
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+def _last_line_end(f, size):
+    # Offset just past the last newline at or before `size`.
+    position = size
+    while position > 0:
+        start = max(0, position - (1 << 16))
+        f.seek(start)
+        block = f.read(position - start)
+        newline = block.rfind(b"\n")
+        if newline >= 0:
+            return start + newline + 1
+        position = start
+    return 0
+
+class ScorecardStore:
+    def __init__(self, path=SCORECARD_DB_PATH, csv_path=SUPPLY_CHAIN_CSV):
+        self.path = path
+        self.csv_path = csv_path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        values_sql = ", ".join(
+            f"{column} {'INTEGER' if column.endswith(('_count', '_n')) else 'REAL'} NOT NULL DEFAULT 0"
+            for column in VALUE_COLUMNS
+        )
+        for table, _, table_keys in SCORECARD_GRAINS.values():
+            columns = [row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+            if columns and "source" not in columns:
+                # Tables from before aggregates were kept per source: drop them
+                # and their watermarks so every source is rebuilt on refresh.
+                self._conn.execute(f"DROP TABLE {table}")
+                self._conn.execute("DROP TABLE IF EXISTS watermark")
+            keys_sql = ", ".join(f"{key} TEXT NOT NULL" for key in table_keys)
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (source TEXT NOT NULL, {keys_sql}, {values_sql}, "
+                f"PRIMARY KEY (source, {', '.join(table_keys)}))"
+            )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS watermark (
+                   source TEXT PRIMARY KEY,
+                   byte_offset INTEGER NOT NULL,
+                   rows INTEGER NOT NULL,
+                   header_hash TEXT NOT NULL,
+                   anchor_hash TEXT NOT NULL
+               )"""
+        )
+        self._conn.commit()
+
+    # --- watermark ---
+    def _source(self):
+        return os.path.abspath(self.csv_path)
+
+    def _watermark(self):
+        row = self._conn.execute(
+            "SELECT byte_offset, rows, header_hash, anchor_hash FROM watermark WHERE source = ?", (self._source(),)
+        ).fetchone()
+        return dict(zip(("byte_offset", "rows", "header_hash", "anchor_hash"), row)) if row else None
+
+    @staticmethod
+    def _anchor_hash(f, offset):
+        f.seek(max(0, offset - ANCHOR_BYTES))
+        return hashlib.sha256(f.read(min(offset, ANCHOR_BYTES))).hexdigest()
+
+    # --- maintenance ---
+    def refresh(self) -> dict:
+        # Folds rows appended since the last refresh into the aggregates. Falls
+        # back to a full rebuild when the header changed, the file shrank, or
+        # the bytes just before the watermark no longer match (file rewritten).
+        with self._lock, open(self.csv_path, "rb") as f:
+            header = f.readline()
+            header_end = f.tell()
+            size = os.fstat(f.fileno()).st_size
+            header_hash = hashlib.sha256(header).hexdigest()
+
+            mark = self._watermark()
+            rebuilt = (
+                mark is None
+                or mark["header_hash"] != header_hash
+                or size < mark["byte_offset"]
+                or self._anchor_hash(f, mark["byte_offset"]) != mark["anchor_hash"]
+            )
+            start = header_end if rebuilt else mark["byte_offset"]
+            rows = 0 if rebuilt else mark["rows"]
+            end = _last_line_end(f, size)
+            if not rebuilt and end <= start:
+                return {"rebuilt": False, "new_rows": 0, "rows": rows}
+
+            with span("scorecards.refresh", rebuilt=rebuilt, bytes=max(end - start, 0)) as s:
+                columns = header.decode("utf-8-sig").strip().split(",")
+                new_rows = 0
+                with self._conn:  # one transaction: aggregates and watermark move together
+                    if rebuilt:
+                        for table, _, _ in SCORECARD_GRAINS.values():
+                            self._conn.execute(f"DELETE FROM {table} WHERE source = ?", (self._source(),))
+                    if end > start:
+                        new_rows = self._consume(f, start, end, columns)
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO watermark (source, byte_offset, rows, header_hash, anchor_hash) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (self._source(), max(end, start), rows + new_rows, header_hash,
+                         self._anchor_hash(f, max(end, start))),
+                    )
+                s["attributes"]["new_rows"] = new_rows
+            return {"rebuilt": rebuilt, "new_rows": new_rows, "rows": rows + new_rows}
+
+    def _consume(self, f, start, end, columns):
+        dtypes = _csv_read_dtypes({c: SUPPLY_CHAIN_DTYPES[c] for c in SCORECARD_COLUMNS})
+        reader = pd.read_csv(
+            io.BufferedReader(_RangeReader(f, start, end)),
+            header=None, names=columns, usecols=SCORECARD_COLUMNS,
+            dtype=dtypes, chunksize=CSV_CHUNK_ROWS,
+        )
+        new_rows = 0
+        for chunk in reader:
+            new_rows += len(chunk)
+            for table, keys, table_keys in SCORECARD_GRAINS.values():
+                self._upsert(table, table_keys, aggregate_chunk(chunk, keys))
+        return new_rows
+
+    def _upsert(self, table, table_keys, partial):
+        columns = ["source"] + table_keys + VALUE_COLUMNS
+        updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in VALUE_COLUMNS)
+        source = self._source()
+        self._conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT (source, {', '.join(table_keys)}) DO UPDATE SET {updates}",
+            ((source,) + row for row in partial.itertuples(index=False, name=None)),
+        )
+
+    def rebuild(self) -> dict:
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM watermark WHERE source = ?", (self._source(),))
+        return self.refresh()
+
+    # --- reads ---
+    def scorecards(self, grain="supplier") -> pd.DataFrame:
+        # One row per group with count, fail rate, and mean/std per metric,
+        # derived from the stored sums in O(#groups).
+        table, keys, table_keys = SCORECARD_GRAINS[grain]
+        with self._lock:
+            raw = pd.read_sql_query(
+                f"SELECT * FROM {table} WHERE source = ? ORDER BY {', '.join(table_keys)}",
+                self._conn, params=(self._source(),),
+            )
+        cards = raw[table_keys].set_axis(keys, axis=1)
+        cards["SKUs"] = raw["row_count"]
+        cards["Fail Rate"] = raw["fail_count"] / raw["row_count"]
+        cards["Pending Inspections"] = raw["pending_count"]
+        for source, prefix in SCORECARD_METRICS.items():
+            n = raw[f"{prefix}_n"].where(raw[f"{prefix}_n"] > 0)
+            mean = raw[f"{prefix}_sum"] / n
+            # sample variance from the running sums; clipped at 0 against rounding
+            variance = ((raw[f"{prefix}_sumsq"] - raw[f"{prefix}_sum"] * mean) / (n - 1).where(n > 1)).clip(lower=0)
+            cards[f"{source} Mean"] = mean
+            cards[f"{source} Std"] = np.sqrt(variance)
+        return cards
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# === Process-wide default store ===
+_default_store = None
+_default_lock = threading.Lock()
+
+def get_store() -> ScorecardStore:
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = ScorecardStore()
+    return _default_store
+
+def supplier_scorecards(grain="supplier", refresh=True) -> pd.DataFrame:
+    store = get_store()
+    if refresh:
+        store.refresh()
+    return store.scorecards(grain)
+
+if __name__ == "__main__":
+    result = get_store().refresh()
+    print(f"📊 {'Rebuilt' if result['rebuilt'] else 'Updated'} scorecards: +{result['new_rows']} rows ({result['rows']} total)")
+    print(supplier_scorecards(refresh=False).round(3).to_string(index=False))